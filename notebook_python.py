@@ -103,19 +103,66 @@ print("Extract selesai bro!")
 # Ekstraksi ini bertujuan untuk memperoleh file CSV yang akan digunakan dalam tahap selanjutnya.
 #%%
 # Load dataset menggunakan pandas
+import hashlib
+from pathlib import Path
+
 import pandas as pd
 
-books = pd.read_csv('BookRecommendation/Books.csv', low_memory=False)
-users = pd.read_csv('BookRecommendation/Users.csv')
-ratings = pd.read_csv('BookRecommendation/Ratings.csv')
+# Tipe data eksplisit: kategori untuk kolom dengan banyak nilai berulang, integer kecil untuk ID dan rating
+BOOKS_DTYPES = {
+    'ISBN': 'str',
+    'Book-Title': 'str',
+    'Book-Author': 'category',
+    'Year-Of-Publication': 'str',
+    'Publisher': 'category',
+    'Image-URL-S': 'str',
+    'Image-URL-M': 'str',
+    'Image-URL-L': 'str'
+}
+USERS_DTYPES = {'User-ID': 'int32', 'Location': 'str', 'Age': 'float32'}
+RATINGS_DTYPES = {'User-ID': 'int32', 'ISBN': 'category', 'Book-Rating': 'int8'}
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_csv_cached(path, dtype, cache_dir='BookRecommendation/cache'):
+    # Salinan Parquet disimpan dengan nama berdasarkan hash file CSV; jika CSV berubah, cache otomatis dibuat ulang
+    path, cache_dir = Path(path), Path(cache_dir)
+    cache_path = cache_dir / f'{path.stem}-{file_hash(path)}.parquet'
+    if cache_path.exists():
+        return pd.read_parquet(cache_path)
+
+    df = pd.read_csv(path, dtype=dtype)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for old_cache in cache_dir.glob(f'{path.stem}-*.parquet'):
+        old_cache.unlink()
+    df.to_parquet(cache_path, index=False)
+    return df
+
+books = read_csv_cached('BookRecommendation/Books.csv', BOOKS_DTYPES)
+users = read_csv_cached('BookRecommendation/Users.csv', USERS_DTYPES)
+ratings = read_csv_cached('BookRecommendation/Ratings.csv', RATINGS_DTYPES)
 
 print("Dataset berhasil dimuat!")
+for name, df in [('Books', books), ('Users', users), ('Ratings', ratings)]:
+    print(f"Memori {name}: {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
 #%% md
 # #### Load Dataset
 # 
 # Pada tahap ini, dataset yang sudah diekstrak akan dibaca ke dalam struktur DataFrame menggunakan library `pandas`.
 # Dataset terdiri dari tiga file utama: `Books.csv`, `Users.csv`, dan `Ratings.csv`.
 # 
+# **Teknik yang digunakan:**
+# - **Tipe data eksplisit**: `Book-Author`, `Publisher`, dan `ISBN` pada Ratings disimpan sebagai `category` (setiap nilai unik hanya disimpan sekali), `User-ID` sebagai `int32`, dan `Book-Rating` sebagai `int8`. `ISBN` pada Books tetap berupa string karena setiap barisnya unik.
+# - **Cache Parquet**: pembacaan CSV pertama kali disimpan sebagai file Parquet di `BookRecommendation/cache/`, dengan nama file berdasarkan hash isi CSV. Run berikutnya langsung membaca Parquet (kolumnar, tipe data tetap terjaga). Jika CSV berubah, hash berubah sehingga cache dibuat ulang.
+# 
+# **Alasan:**
+# - Parsing CSV dengan kolom string bertipe `object` lambat dan boros memori, dan sebelumnya diulang pada setiap run.
+# 
 #%%
 # Menampilkan jumlah baris dan kolom dari setiap dataset
 print(f"Jumlah data Books: {books.shape}")
@@ -140,7 +187,7 @@ books.info()
 # #### Struktur Data Books
 # 
 # Pada tahap ini, kami menampilkan struktur data dari dataset Books menggunakan fungsi `.info()`.
-# Dataset Books memiliki 271.360 entri dan 8 kolom. Semua kolom bertipe data object (string).
+# Dataset Books memiliki 271.360 entri dan 8 kolom. Kolom `Book-Author` dan `Publisher` bertipe `category`, sedangkan kolom lainnya bertipe string.
 # 
 # Berikut detail jumlah non-null untuk setiap kolom:
 # - `ISBN`: 271.360 non-null
@@ -238,9 +285,9 @@ ratings.info()
 # Dataset Ratings memiliki sebanyak **1.149.780 entri** dengan **3 kolom**: `User-ID`, `ISBN`, dan `Book-Rating`.
 # 
 # Detail tipe data:
-# - `User-ID`: integer
-# - `ISBN`: object (string)
-# - `Book-Rating`: integer
+# - `User-ID`: integer (`int32`)
+# - `ISBN`: `category`
+# - `Book-Rating`: integer (`int8`)
 # 
 # Semua kolom tidak memiliki missing value berdasarkan jumlah non-null yang sama dengan jumlah total entri.
 #%%
@@ -314,9 +361,9 @@ users.info()
 # Dataset Users memiliki sebanyak **278.858 entri** dengan **3 kolom**, yaitu: `User-ID`, `Location`, dan `Age`.
 # 
 # Detail tipe data:
-# - `User-ID`: integer
-# - `Location`: object (string)
-# - `Age`: float64
+# - `User-ID`: integer (`int32`)
+# - `Location`: string
+# - `Age`: `float32`
 # 
 # Terdapat missing value pada kolom `Age`, karena jumlah non-null lebih sedikit dibanding total entri.
 #%%
@@ -398,7 +445,7 @@ top_books = ratings['ISBN'].value_counts().head(10)
 
 # Visualisasi 10 ISBN dengan rating terbanyak
 plt.figure(figsize=(12,6))
-sns.barplot(x=top_books.values, y=top_books.index)
+sns.barplot(x=top_books.values, y=top_books.index.astype(str))  # ISBN kategori diubah ke string agar hanya 10 ISBN yang diplot
 plt.title('10 Buku dengan Rating Terbanyak (ISBN)')
 plt.xlabel('Jumlah Rating')
 plt.ylabel('ISBN Buku')
@@ -509,24 +556,24 @@ plt.show()
 # #### Uraian Variabel
 # 
 # **Books.csv**
-# - `ISBN` : ID unik buku. Tipe data **object**. Jumlah non-null: **271.360**.
-# - `Book-Title` : Judul buku. Tipe data **object**. Jumlah non-null: **271.360**.
-# - `Book-Author` : Nama penulis buku. Tipe data **object**. Jumlah non-null: **271.358** (terdapat 2 missing value).
-# - `Year-Of-Publication` : Tahun terbit buku. Tipe data **object**. Jumlah non-null: **271.360**.
-# - `Publisher` : Nama penerbit buku. Tipe data **object**. Jumlah non-null: **271.358** (terdapat 2 missing value).
-# - `Image-URL-S` : URL gambar sampul kecil. Tipe data **object**. Jumlah non-null: **271.360**.
-# - `Image-URL-M` : URL gambar sampul sedang. Tipe data **object**. Jumlah non-null: **271.360**.
-# - `Image-URL-L` : URL gambar sampul besar. Tipe data **object**. Jumlah non-null: **271.357** (terdapat 3 missing value).
+# - `ISBN` : ID unik buku. Tipe data **string**. Jumlah non-null: **271.360**.
+# - `Book-Title` : Judul buku. Tipe data **string**. Jumlah non-null: **271.360**.
+# - `Book-Author` : Nama penulis buku. Tipe data **category**. Jumlah non-null: **271.358** (terdapat 2 missing value).
+# - `Year-Of-Publication` : Tahun terbit buku. Tipe data **string**. Jumlah non-null: **271.360**.
+# - `Publisher` : Nama penerbit buku. Tipe data **category**. Jumlah non-null: **271.358** (terdapat 2 missing value).
+# - `Image-URL-S` : URL gambar sampul kecil. Tipe data **string**. Jumlah non-null: **271.360**.
+# - `Image-URL-M` : URL gambar sampul sedang. Tipe data **string**. Jumlah non-null: **271.360**.
+# - `Image-URL-L` : URL gambar sampul besar. Tipe data **string**. Jumlah non-null: **271.357** (terdapat 3 missing value).
 # 
 # **Users.csv**
-# - `User-ID` : ID unik pengguna. Tipe data **int64**. Jumlah non-null: **168.096**.
-# - `Location` : Lokasi pengguna (Kota, Provinsi, Negara). Tipe data **object**. Jumlah non-null: **168.096**.
-# - `Age` : Usia pengguna. Tipe data **float64**. Jumlah non-null: **168.096**.
+# - `User-ID` : ID unik pengguna. Tipe data **int32**. Jumlah non-null: **168.096**.
+# - `Location` : Lokasi pengguna (Kota, Provinsi, Negara). Tipe data **string**. Jumlah non-null: **168.096**.
+# - `Age` : Usia pengguna. Tipe data **float32**. Jumlah non-null: **168.096**.
 # 
 # **Ratings.csv**
-# - `User-ID` : ID pengguna yang memberikan rating. Tipe data **int64**. Jumlah non-null: **1.149.780**.
-# - `ISBN` : ISBN buku yang diberi rating. Tipe data **object**. Jumlah non-null: **1.149.780**.
-# - `Book-Rating` : Rating dari pengguna ke buku (skala 0–10). Tipe data **int64**. Jumlah non-null: **1.149.780**.
+# - `User-ID` : ID pengguna yang memberikan rating. Tipe data **int32**. Jumlah non-null: **1.149.780**.
+# - `ISBN` : ISBN buku yang diberi rating. Tipe data **category**. Jumlah non-null: **1.149.780**.
+# - `Book-Rating` : Rating dari pengguna ke buku (skala 0–10). Tipe data **int8**. Jumlah non-null: **1.149.780**.
 # 
 # ---
 # 
@@ -715,6 +762,129 @@ print('Jumlah data Ratings setelah filtering user dan book aktif:', ratings.shap
 # - Setelah filtering user dan book aktif, jumlah data menjadi **203.851 entri** dan **3 kolom**.
 # 
 #%%
+import numpy as np
+
+def filter_min_ratings(user_codes, book_codes, min_user_ratings=3, min_book_ratings=3, k_core=False):
+    # k_core=False: sama seperti filtering di atas (user dulu, lalu buku, tanpa cek ulang user)
+    # k_core=True : diulang sampai stabil, sehingga semua user dan buku yang tersisa memenuhi batas minimum
+    keep = np.ones(len(user_codes), dtype=bool)
+    if len(user_codes) == 0:
+        return keep, 0
+    n_users, n_books = user_codes.max() + 1, book_codes.max() + 1
+    iterations = 0
+    while True:
+        iterations += 1
+        user_counts = np.bincount(user_codes[keep], minlength=n_users)
+        keep &= user_counts[user_codes] >= min_user_ratings
+        book_counts = np.bincount(book_codes[keep], minlength=n_books)
+        keep &= book_counts[book_codes] >= min_book_ratings
+        if not k_core:
+            break
+        user_counts = np.bincount(user_codes[keep], minlength=n_users)
+        if np.all(user_counts[user_codes[keep]] >= min_user_ratings):
+            break
+    return keep, iterations
+
+def stream_filter_ratings(path, min_user_ratings=3, min_book_ratings=3, k_core=False,
+                          chunksize=1_000_000, output_path=None):
+    # Setiap pass membaca ulang CSV per chunk. Yang disimpan antar chunk hanya jumlah rating dan mask
+    # per user/buku, sehingga memori sebanding dengan jumlah user + buku unik, bukan jumlah rating
+    def read_chunks():
+        reader = pd.read_csv(path, dtype={'User-ID': 'int32', 'ISBN': 'str', 'Book-Rating': 'int8'}, chunksize=chunksize)
+        for chunk in reader:
+            yield len(chunk), chunk[chunk['Book-Rating'] != 0]
+
+    # Pass pertama: jumlah rating per user dan daftar ISBN unik
+    user_counts, isbns = pd.Series(dtype='int64'), pd.Index([], dtype='str')
+    n_read = n_nonzero = 0
+    for n_rows, chunk in read_chunks():
+        n_read += n_rows
+        n_nonzero += len(chunk)
+        user_counts = user_counts.add(chunk['User-ID'].value_counts(), fill_value=0)
+        isbns = isbns.union(pd.Index(chunk['ISBN'].unique()))
+    user_ids = user_counts.index
+    user_ok = user_counts.to_numpy() >= min_user_ratings
+    book_ok = np.ones(len(isbns), dtype=bool)
+
+    def encoded_chunks():
+        for _, chunk in read_chunks():
+            user_codes = user_ids.get_indexer(chunk['User-ID'])
+            book_codes = isbns.get_indexer(chunk['ISBN'])
+            yield chunk, user_codes, book_codes, user_ok[user_codes] & book_ok[book_codes]
+
+    def count_pass(by_user):
+        counts = np.zeros(len(user_ok) if by_user else len(book_ok), dtype=np.int64)
+        for _, user_codes, book_codes, keep in encoded_chunks():
+            codes = user_codes if by_user else book_codes
+            counts += np.bincount(codes[keep], minlength=len(counts))
+        return counts
+
+    # Urutan sama dengan filter_min_ratings: user dulu, lalu buku dihitung dari baris user yang lolos
+    book_ok &= count_pass(by_user=False) >= min_book_ratings
+    iterations = 1
+    while k_core:
+        kept_user_counts = count_pass(by_user=True)
+        if np.all(kept_user_counts[kept_user_counts > 0] >= min_user_ratings):
+            break
+        iterations += 1
+        user_ok &= kept_user_counts >= min_user_ratings
+        book_ok &= count_pass(by_user=False) >= min_book_ratings
+
+    # Pass terakhir: hanya baris yang lolos yang disimpan, dengan ISBN sebagai kode kategori
+    kept_book_code = (np.cumsum(book_ok) - 1).astype(np.int32)
+    user_chunks, book_chunks, rating_chunks = [np.empty(0, np.int32)], [np.empty(0, np.int32)], [np.empty(0, np.int8)]
+    for chunk, _, book_codes, keep in encoded_chunks():
+        user_chunks.append(chunk['User-ID'].to_numpy()[keep])
+        book_chunks.append(kept_book_code[book_codes[keep]])
+        rating_chunks.append(chunk['Book-Rating'].to_numpy()[keep])
+
+    # ISBN dikembalikan sebagai kategori: setiap baris hanya menyimpan kode, string disimpan sekali
+    filtered = pd.DataFrame({
+        'User-ID': np.concatenate(user_chunks),
+        'ISBN': pd.Categorical.from_codes(np.concatenate(book_chunks), categories=isbns[book_ok]).remove_unused_categories(),
+        'Book-Rating': np.concatenate(rating_chunks)
+    })
+    if output_path is not None:
+        filtered.to_parquet(output_path, index=False)
+
+    stats = {'rows_read': n_read, 'rows_nonzero': n_nonzero, 'rows_kept': len(filtered), 'iterations': iterations}
+    return filtered, stats
+
+ratings_streamed, stream_stats = stream_filter_ratings('BookRecommendation/Ratings.csv', output_path='BookRecommendation/ratings_filtered.parquet')
+print(stream_stats)
+
+# Hasil streaming harus sama dengan filtering in-memory di atas
+assert np.array_equal(ratings_streamed['User-ID'].to_numpy(), ratings['User-ID'].to_numpy())
+assert np.array_equal(ratings_streamed['ISBN'].astype(str).to_numpy(), ratings['ISBN'].astype(str).to_numpy())
+assert np.array_equal(ratings_streamed['Book-Rating'].to_numpy(), ratings['Book-Rating'].to_numpy())
+
+# Versi k-core: filtering diulang sampai semua user dan buku memiliki minimal 3 rating
+ratings_k_core, k_core_stats = stream_filter_ratings('BookRecommendation/Ratings.csv', k_core=True)
+print(k_core_stats)
+
+# k-core hasil streaming harus sama dengan k-core in-memory (filter_min_ratings atas kode integer)
+k_core_keep, _ = filter_min_ratings(
+    pd.factorize(ratings['User-ID'])[0], pd.factorize(ratings['ISBN'])[0], k_core=True
+)
+assert k_core_keep.sum() == len(ratings_k_core)
+assert filter_min_ratings(np.empty(0, np.int64), np.empty(0, np.int64))[0].size == 0
+#%% md
+# #### Pipeline Filtering Streaming per Chunk
+# 
+# Pada tahap ini, kami membuat versi streaming dari proses cleaning dan filtering Ratings untuk data yang tidak muat di memori.
+# 
+# **Teknik yang digunakan:**
+# - `stream_filter_ratings` membaca `Ratings.csv` per chunk (`chunksize` baris) dalam beberapa pass. Pass pertama menghitung jumlah rating (bukan 0) per user dan mengumpulkan daftar ISBN unik. Pass berikutnya membaca ulang file dan menghitung jumlah rating per buku dengan `np.bincount`, hanya dari baris yang user dan bukunya masih lolos. Pass terakhir menyimpan baris yang lolos saja.
+# - Di antara chunk, yang disimpan di memori hanya jumlah rating dan mask per user dan per buku, sehingga memori sebanding dengan jumlah user + buku unik (ditambah hasil akhir), bukan jumlah seluruh rating.
+# - `filter_min_ratings` adalah versi in-memory dari filtering yang sama atas kode integer (`np.bincount`, bukan `value_counts` + `isin` pada string).
+# - `k_core=False` menghasilkan data yang sama persis dengan filtering di atas (user difilter dulu, lalu buku). Filtering tersebut bergantung urutan: setelah buku dibuang, sebagian user bisa kembali memiliki kurang dari 3 rating.
+# - `k_core=True` mengulang filtering sampai tidak ada lagi user atau buku yang berubah (*k-core fixed point*), sehingga setiap user dan buku yang tersisa benar-benar memiliki minimal 3 rating. Setiap iterasi membaca ulang file.
+# - Hasil filtering ditulis ke Parquet (`output_path`) dengan ISBN sebagai kolom kategori (dictionary-encoded).
+# 
+# **Hasil:**
+# - Hasil streaming (`k_core=False`) diverifikasi sama dengan hasil filtering in-memory, dan hasil k-core diverifikasi sama dengan `filter_min_ratings(k_core=True)`.
+# - Jumlah iterasi dan jumlah baris hasil k-core ditampilkan pada `stats`.
+#%%
 # Membuat list User-ID, ISBN, dan Book-Rating
 user_id = ratings['User-ID'].tolist()
 isbn = ratings['ISBN'].tolist()
@@ -792,7 +962,14 @@ books_filtered['Book-Title'] = books_filtered['Book-Title'].fillna('')
 # Fit and transform
 tfidf_matrix = tfidf.fit_transform(books_filtered['Book-Title'])
 
+# Index judul -> baris tfidf_matrix (satu judul bisa memiliki beberapa ISBN/edisi)
+title_to_indices = books_filtered.groupby('Book-Title', sort=False).indices
+
+# Index ISBN -> baris tfidf_matrix
+isbn_to_index = {x: i for i, x in enumerate(books_filtered['ISBN'])}
+
 print('TF-IDF Matrix Shape:', tfidf_matrix.shape)
+print('Jumlah judul unik:', len(title_to_indices))
 #%% md
 # #### Membuat TF-IDF Matrix dari Judul Buku
 # 
@@ -812,87 +989,86 @@ print('TF-IDF Matrix Shape:', tfidf_matrix.shape)
 # - **Fit and Transform**:
 #   - Melakukan fit dan transform pada kolom `Book-Title`, menghasilkan TF-IDF matrix.
 # 
+# - **Index Judul dan ISBN**:
+#   - `title_to_indices` memetakan setiap judul ke seluruh baris `tfidf_matrix` yang memiliki judul tersebut. Satu judul bisa muncul lebih dari sekali karena edisi/format berbeda memiliki ISBN berbeda.
+#   - `isbn_to_index` memetakan setiap ISBN ke baris `tfidf_matrix`-nya.
+#   - Kedua index dibangun sekali di sini, sehingga pencarian buku pada fungsi rekomendasi cukup berupa lookup dictionary O(1), bukan perbandingan string ke seluruh katalog.
+# 
 # **Hasil:**
 # - Ukuran TF-IDF matrix yang dihasilkan adalah **(24.253, 16.052)**,
 #   yang berarti terdapat **24.253 judul buku** dan **16.052 fitur unik** (kata-kata unik dari seluruh judul buku).
 #%%
-# Menghitung Cosine Similarity dari TF-IDF Matrix
-cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+# Import library tambahan
+import numpy as np
+from scipy.sparse import csr_matrix
 
-print('Cosine Similarity Matrix Shape:', cosine_sim.shape)
-#%% md
-# #### Menghitung Cosine Similarity Antar Judul Buku
-# 
-# Pada tahap ini, kami menghitung skor kemiripan (similarity score) antar semua judul buku berdasarkan TF-IDF matrix yang telah dibuat sebelumnya.
-# 
-# **Teknik yang digunakan:**
-# - **Cosine Similarity**:
-#   Mengukur tingkat kemiripan antar vektor TF-IDF dari judul buku.
-#   Skor cosine similarity berkisar dari 0 (tidak mirip) hingga 1 (sangat mirip).
-# 
-# **Proses:**
-# - Menggunakan fungsi `cosine_similarity` dari scikit-learn untuk menghitung kemiripan antar seluruh kombinasi judul buku.
-# 
-# **Hasil:**
-# - Matriks cosine similarity yang dihasilkan berukuran **(24.253, 24.253)**.
-# - Artinya, terdapat **24.253 judul buku** yang dibandingkan satu sama lain untuk mengukur tingkat kemiripannya.
-#%%
-# Membuat User-Item Matrix
-user_item_matrix = ratings_clean.pivot_table(index='user_id', columns='isbn', values='book_rating')
+def select_topk(block, top_k):
+    # Ambil top_k kandidat per baris tanpa sorting penuh, lalu urutkan kandidatnya saja
+    candidates = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+    candidates.sort(axis=1)
+    scores = np.take_along_axis(block, candidates, axis=1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(scores, order, axis=1)
 
-print('User-Item Matrix Shape:', user_item_matrix.shape)
+def build_topk_similarity(tfidf_matrix, top_k=50, block_size=512):
+    # Setiap buku hanya menyimpan top_k tetangga (selain dirinya sendiri)
+    tfidf_matrix = tfidf_matrix.tocsr()
+    n_books = tfidf_matrix.shape[0]
+    top_k = min(top_k, n_books - 1)
+    tfidf_matrix_t = tfidf_matrix.T.tocsc()
 
-user_item_matrix.head()
-#%% md
-# #### Membuat User-Item Matrix untuk Collaborative Filtering
-# 
-# Pada tahap ini, kami membangun User-Item Matrix dari dataset `ratings_clean`.
-# 
-# **Teknik yang digunakan:**
-# - Membentuk pivot table menggunakan `pivot_table` di pandas.
-# - Struktur matriks:
-#   - **Baris** = `user_id`
-#   - **Kolom** = `isbn` (buku)
-#   - **Nilai** = `book_rating` yang diberikan user terhadap buku.
-# 
-# **Proses:**
-# - Setiap user menjadi baris dalam tabel.
-# - Setiap ISBN buku menjadi kolom dalam tabel.
-# - Jika user memberikan rating pada buku, maka sel tersebut berisi nilai rating. Jika tidak, maka berisi NaN (missing value).
-# 
-# **Hasil:**
-# - Ukuran User-Item Matrix adalah **(20.908, 25.790)**.
-# - Banyak nilai missing (NaN) karena sebagian besar user hanya memberikan rating pada sebagian kecil dari seluruh buku yang tersedia.
-#%%
-# Menghitung Cosine Similarity antar pengguna
-user_similarity = cosine_similarity(user_item_matrix.fillna(0))  # Missing value diganti 0
+    neighbor_indices = np.empty((n_books, top_k), dtype=np.int32)
+    neighbor_scores = np.empty((n_books, top_k), dtype=np.float32)
+
+    # Hitung similarity per blok baris, jadi yang dense hanya block_size x N
+    for start in range(0, n_books, block_size):
+        end = min(start + block_size, n_books)
+        rows = np.arange(end - start)
+
+        # Baris TF-IDF sudah ternormalisasi L2, jadi dot product = cosine similarity
+        block = (tfidf_matrix[start:end] @ tfidf_matrix_t).toarray().astype(np.float32)
+        block[rows, rows + start] = -np.inf  # Buang dirinya sendiri
 
-print('User Similarity Matrix Shape:', user_similarity.shape)
+        neighbor_indices[start:end], neighbor_scores[start:end] = select_topk(block, top_k)
+
+    indptr = np.arange(0, n_books * top_k + 1, top_k, dtype=np.int64)
+    return csr_matrix(
+        (neighbor_scores.ravel(), neighbor_indices.ravel(), indptr),
+        shape=(n_books, n_books)
+    )
+
+# Membangun indeks Top-K tetangga langsung dari TF-IDF Matrix yang sparse
+content_neighbors = build_topk_similarity(tfidf_matrix, top_k=50)
+
+print('Content Neighbor Index Shape:', content_neighbors.shape)
+print('Jumlah tetangga per buku:', content_neighbors.indptr[1] - content_neighbors.indptr[0])
 #%% md
-# #### Menghitung Cosine Similarity Antar User
+# #### Menghitung Cosine Similarity Antar Judul Buku
 # 
-# Pada tahap ini, kami menghitung skor kemiripan (similarity score) antar semua pengguna berdasarkan pola rating mereka terhadap buku.
+# Pada tahap ini, kami menghitung skor kemiripan (similarity score) antar judul buku berdasarkan TF-IDF matrix yang telah dibuat sebelumnya.
 # 
 # **Teknik yang digunakan:**
 # - **Cosine Similarity**:
-#   Mengukur tingkat kesamaan antar vektor pengguna pada User-Item Matrix.
+#   Mengukur tingkat kemiripan antar vektor TF-IDF dari judul buku.
 #   Skor cosine similarity berkisar dari 0 (tidak mirip) hingga 1 (sangat mirip).
+# - **Top-K Neighbor Index**:
+#   Untuk setiap buku, hanya **50 judul paling mirip** (selain dirinya sendiri) yang disimpan dalam sebuah sparse matrix (CSR).
 # 
 # **Proses:**
-# - Menggunakan fungsi `cosine_similarity` dari scikit-learn.
-# - User-Item Matrix yang mengandung missing value (NaN) diisi dengan angka 0 sebelum perhitungan.
-# - Cosine Similarity dihitung antar seluruh kombinasi pasangan user.
+# - Cosine similarity dihitung per blok baris (`block_size` baris sekaligus) langsung dari `tfidf_matrix` yang sparse, sehingga tidak pernah terbentuk matriks dense berukuran N x N.
+# - Pada setiap blok, Top-K kandidat dipilih dengan `np.argpartition`, lalu hanya kandidat tersebut yang diurutkan dari skor tertinggi.
+# - Hasilnya disimpan dalam `content_neighbors`, di mana baris ke-i berisi index dan skor tetangga buku ke-i yang sudah terurut.
 # 
 # **Hasil:**
-# - Matriks cosine similarity yang dihasilkan berukuran **(20.908, 20.908)**.
-# - Artinya, terdapat **20.908 pengguna** yang dibandingkan satu sama lain untuk mengukur tingkat kemiripannya.
+# - Kebutuhan memori turun dari O(N²) menjadi O(N·K). Sebagai gambaran, matriks dense float64 untuk **24.253 judul buku** membutuhkan sekitar 4,7 GB, sedangkan indeks Top-50 hanya sekitar 10 MB.
+# - Indeks di notebook ini tetap dibangun dari `books_filtered` (buku yang memiliki rating). Karena memorinya tumbuh linear terhadap jumlah buku, indeks yang sama secara memori juga memungkinkan untuk seluruh `Books.csv` (sekitar 271 ribu buku), tetapi hal tersebut tidak dilakukan di sini.
 #%%
-# Membuat list user_id unik
-user_ids = ratings_clean['user_id'].unique().tolist()
+# Membuat array user_id unik (urutan kemunculan)
+user_ids = ratings_clean['user_id'].unique()
 print('Jumlah user unik:', len(user_ids))
 
-# Membuat list isbn unik
-isbn_ids = ratings_clean['isbn'].unique().tolist()
+# Membuat array isbn unik (urutan kemunculan)
+isbn_ids = ratings_clean['isbn'].unique()
 print('Jumlah buku unik:', len(isbn_ids))
 #%% md
 # #### Membuat List User-ID dan ISBN Unik
@@ -904,20 +1080,111 @@ print('Jumlah buku unik:', len(isbn_ids))
 # - Jumlah ISBN unik: **25.790**
 # 
 #%%
+class IDEncoder:
+    # Encoder ID -> kode int32 berbasis array NumPy (pengganti dict Python)
+    def __init__(self, classes=(), order=None):
+        classes = np.asarray(classes)
+        if classes.dtype.kind == 'O':
+            classes = classes.astype(str)  # ISBN disimpan sebagai array 'U' yang ringkas
+        self.classes_ = classes  # kode i  -> ID asli, urutan kemunculan
+        # Salinan terurut + posisi aslinya, untuk lookup vektorisasi dengan searchsorted
+        self.order_ = (np.argsort(classes, kind='stable') if order is None else np.asarray(order)).astype(np.int32)
+        self.sorted_ = classes[self.order_]
+
+    def __len__(self):
+        return len(self.classes_)
+
+    def __contains__(self, x):
+        return self.encode([x])[0] >= 0
+
+    def _as_ids(self, ids):
+        ids = np.asarray(ids)
+        if ids.dtype.kind == 'O' or (self.classes_.dtype.kind == 'U' and ids.dtype.kind != 'U'):
+            ids = ids.astype(str)
+        return ids
+
+    def encode(self, ids):
+        # Kode int32 untuk setiap ID; ID yang tidak dikenal mendapat -1
+        ids = self._as_ids(ids)
+        if len(self.classes_) == 0:
+            return np.full(ids.shape, -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self.sorted_, ids), len(self.sorted_) - 1)
+        found = self.sorted_[pos] == ids
+        return np.where(found, self.order_[pos], -1).astype(np.int32)
+
+    def decode(self, codes):
+        return self.classes_[np.asarray(codes)]
+
+    def add(self, ids):
+        # ID baru ditambahkan di akhir, sehingga kode yang sudah ada tidak berubah
+        ids = self._as_ids(ids)
+        if len(self.classes_) == 0:
+            # Encoder kosong mengikuti tipe ID pertama yang ditambahkan (misalnya int untuk User-ID, 'U' untuk ISBN)
+            self.classes_ = self.sorted_ = ids[:0]
+        codes = self.encode(ids)
+        new_ids = pd.unique(ids[codes < 0])
+        if len(new_ids):
+            new_codes = np.arange(len(self.classes_), len(self.classes_) + len(new_ids), dtype=np.int32)
+            new_order = np.argsort(new_ids, kind='stable')
+            # Lebar tipe 'U' diperbesar jika ID baru lebih panjang, supaya ID tidak terpotong saat disisipkan
+            dtype = np.result_type(self.sorted_, new_ids)
+            # Sisipkan ke array terurut (O(n)), tanpa mengurutkan ulang seluruh encoder
+            insert_at = np.searchsorted(self.sorted_, new_ids[new_order])
+            self.classes_ = np.concatenate([self.classes_, new_ids]).astype(dtype, copy=False)
+            self.sorted_ = np.insert(self.sorted_.astype(dtype, copy=False), insert_at, new_ids[new_order])
+            self.order_ = np.insert(self.order_, insert_at, new_codes[new_order])
+            codes = self.encode(ids)
+        return codes
+
+    def save(self, path):
+        np.save(f'{path}.classes.npy', self.classes_)
+        np.save(f'{path}.order.npy', self.order_)
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        return cls(np.load(f'{path}.classes.npy', mmap_mode=mmap_mode),
+                   order=np.load(f'{path}.order.npy', mmap_mode=mmap_mode))
+
+
 # Encoding user_id dan isbn ke integer
-user_to_user_encoded = {x: i for i, x in enumerate(user_ids)}
-isbn_to_isbn_encoded = {x: i for i, x in enumerate(isbn_ids)}
+user_encoder = IDEncoder(user_ids)
+isbn_encoder = IDEncoder(isbn_ids)
 
-user_encoded_to_user = {i: x for i, x in enumerate(user_ids)}
-isbn_encoded_to_isbn = {i: x for i, x in enumerate(isbn_ids)}
+# Sanity check: round-trip ID -> kode -> ID, dan ID yang tidak dikenal menjadi -1
+assert (user_encoder.decode(user_encoder.encode(user_ids)) == user_encoder.classes_).all()
+assert (isbn_encoder.encode(isbn_ids) == np.arange(len(isbn_ids))).all()
+assert isbn_encoder.encode(['bukan-isbn'])[0] == -1
+
+# Regression check: ID baru yang lebih panjang dari ID lama (ISBN-13) dan encoder kosong
+widened = IDEncoder(np.array(['0195153448', '0002005018']))
+assert widened.add(['9780195153446']).tolist() == [2] and widened.encode(['9780195153446']).tolist() == [2]
+assert widened.decode([2])[0] == '9780195153446'
+empty = IDEncoder()
+assert empty.add(['abc', 'de', 'abc']).tolist() == [0, 1, 0] and empty.encode(['de', 'x']).tolist() == [1, -1]
+assert IDEncoder().add([5, 3]).tolist() == [0, 1]
 #%% md
 # #### Encoding User-ID dan ISBN ke Integer
 # 
 # Kami melakukan encoding user_id dan isbn menjadi integer, agar dapat digunakan sebagai input pada embedding layer dalam model deep learning.
+# 
+# **Teknik yang digunakan:**
+# - Class `IDEncoder` menggantikan empat dictionary Python (`user_to_user_encoded`, `isbn_to_isbn_encoded`, dan kebalikannya).
+# - `classes_` menyimpan ID asli dalam urutan kemunculan (kode ke-i = baris ke-i), sebagai array NumPy. ISBN disimpan sebagai array string `'U'`.
+# - Untuk lookup, disimpan salinan terurut `sorted_` beserta posisi aslinya `order_`, sehingga `encode()` cukup memakai `np.searchsorted` secara vektorisasi dan menghasilkan kode `int32`.
+# 
+# **Proses:**
+# - `encode(ids)` mengubah ID menjadi kode; ID yang tidak dikenal mendapat kode `-1` (tidak melempar `KeyError`).
+# - `decode(codes)` mengubah kode kembali menjadi ID asli dengan indexing array biasa.
+# - `add(ids)` menambahkan ID baru di akhir `classes_` dan menyisipkannya ke array terurut, sehingga kode lama tidak berubah (dipakai pada update inkremental).
+# - `save(path)` / `load(path)` menyimpan encoder sebagai file `.npy` yang dapat dibuka secara memory-mapped.
+# 
+# **Alasan:**
+# - Dictionary Python menyimpan setiap key dan value sebagai objek terpisah, sehingga boros memori dan lambat saat di-lookup satu per satu dengan loop.
+# - Array NumPy jauh lebih ringkas dan lookup ribuan ID sekaligus cukup satu panggilan `searchsorted`.
 #%%
 # Mapping hasil encoding ke dataframe
-ratings_clean['user'] = ratings_clean['user_id'].map(user_to_user_encoded)
-ratings_clean['book'] = ratings_clean['isbn'].map(isbn_to_isbn_encoded)
+ratings_clean['user'] = user_encoder.encode(ratings_clean['user_id'])
+ratings_clean['book'] = isbn_encoder.encode(ratings_clean['isbn'])
 ratings_clean.head()
 #%% md
 # #### Mapping Encoded User dan ISBN ke DataFrame
@@ -946,8 +1213,8 @@ ratings_clean['book_rating'] = ratings_clean['book_rating'].values.astype(np.flo
 # Untuk keperluan model TensorFlow, nilai rating dikonversi ke tipe data float32.
 #%%
 # Mendapatkan jumlah user dan jumlah buku
-num_users = len(user_to_user_encoded)
-num_books = len(isbn_encoded_to_isbn)
+num_users = len(user_encoder)
+num_books = len(isbn_encoder)
 
 print(f"Jumlah user: {num_users}, Jumlah buku: {num_books}")
 #%% md
@@ -960,12 +1227,239 @@ print(f"Jumlah user: {num_users}, Jumlah buku: {num_books}")
 # - Jumlah buku setelah encoding: **25.790**
 # 
 #%%
+# Import library tambahan
+from scipy.sparse import csr_matrix
+
+# Membuat User-Item Matrix (sparse CSR) langsung dari kolom hasil encoding
+user_item_matrix = csr_matrix(
+    (ratings_clean['book_rating'].values, (ratings_clean['user'].values, ratings_clean['book'].values)),
+    shape=(num_users, num_books),
+    dtype=np.float32
+)
+
+print('User-Item Matrix Shape:', user_item_matrix.shape)
+print('Jumlah rating tersimpan:', user_item_matrix.nnz)
+print(f'Density: {user_item_matrix.nnz / (num_users * num_books):.4%}')
+#%% md
+# #### Membuat User-Item Matrix untuk Collaborative Filtering
+# 
+# Pada tahap ini, kami membangun User-Item Matrix dari dataset `ratings_clean`.
+# 
+# **Teknik yang digunakan:**
+# - Membentuk sparse matrix format **CSR** (`scipy.sparse.csr_matrix`) langsung dari kolom hasil encoding `user` dan `book`.
+# - Struktur matriks:
+#   - **Baris** = `user` (hasil encoding `user_id`)
+#   - **Kolom** = `book` (hasil encoding `isbn`)
+#   - **Nilai** = `book_rating` yang diberikan user terhadap buku.
+# 
+# **Proses:**
+# - Hanya pasangan user-buku yang benar-benar memiliki rating yang disimpan. Sel tanpa rating tidak disimpan sama sekali (secara implisit bernilai 0).
+# - Karena rating 0 sudah dibuang pada tahap filtering, nilai 0 pada matriks berarti user belum pernah merating buku tersebut.
+# 
+# **Alasan:**
+# - Pivot table pandas menghasilkan frame dense yang lebih dari 99,9% berisi NaN, lalu `fillna(0)` menyalinnya lagi sebagai float64 sebelum cosine similarity.
+# - Dengan CSR, memori hanya sebanding dengan jumlah rating (nnz), bukan jumlah user x jumlah buku.
+# 
+# **Hasil:**
+# - Ukuran User-Item Matrix adalah **(20.908, 25.790)**, dengan hanya **203.851** sel yang berisi rating.
+#%%
+# Import library tambahan
+from collections import OrderedDict
+from sklearn.preprocessing import normalize
+
+def replace_csr_rows(matrix, rows, new_rows, shape):
+    # Ganti baris `rows` (terurut, boleh melebihi jumlah baris lama) pada CSR dengan baris dari `new_rows`.
+    # Baris lain disalin per blok kontigu, tanpa penjumlahan sparse maupun sorting ulang seluruh matriks
+    n_old = matrix.shape[0]
+    lengths = np.zeros(shape[0], dtype=np.int64)
+    lengths[:n_old] = np.diff(matrix.indptr)
+    lengths[rows] = np.diff(new_rows.indptr)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    data = np.empty(indptr[-1], dtype=matrix.dtype)
+    indices = np.empty(indptr[-1], dtype=np.result_type(matrix.indices, new_rows.indices))
+
+    def copy_block(src, src_start, src_stop, dst_start):
+        dst = slice(dst_start, dst_start + src_stop - src_start)
+        data[dst] = src.data[src_start:src_stop]
+        indices[dst] = src.indices[src_start:src_stop]
+
+    previous = 0
+    for k, row in enumerate(rows):
+        stop = min(row, n_old)
+        if stop > previous:
+            copy_block(matrix, matrix.indptr[previous], matrix.indptr[stop], indptr[previous])
+        copy_block(new_rows, new_rows.indptr[k], new_rows.indptr[k + 1], indptr[row])
+        previous = row + 1
+    if previous < n_old:
+        copy_block(matrix, matrix.indptr[previous], matrix.indptr[n_old], indptr[previous])
+    return csr_matrix((data, indices, indptr), shape=shape)
+
+class UserNeighborIndex:
+    # Cosine similarity antar user yang dihitung on-demand, satu user per permintaan
+    def __init__(self, user_item_matrix, cache_size=1024):
+        # Cache LRU untuk daftar tetangga user yang baru saja diminta
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.update(user_item_matrix)
+
+    def update(self, user_item_matrix):
+        # Normalisasi L2 per baris, sehingga dot product = cosine similarity
+        user_item_normalized = normalize(user_item_matrix, norm='l2', axis=1).tocsr()
+        self.set_normalized(user_item_normalized, user_item_normalized.T.tocsr())
+
+    def set_normalized(self, user_item_normalized, user_item_normalized_t):
+        self.user_item_normalized = user_item_normalized
+        self.user_item_normalized_t = user_item_normalized_t
+        self.shape = (user_item_normalized.shape[0], user_item_normalized.shape[0])
+
+        # Rating berubah, sehingga daftar tetangga yang tersimpan di cache tidak berlaku lagi
+        self.cache.clear()
+
+    def update_rows(self, user_item_matrix, rows, affected_users=None):
+        # Normalisasi ulang hanya baris user yang berubah, lalu tambal baris tersebut pada matriks
+        # ternormalisasi dan transposenya (baris buku yang dirating user tersebut, sebelum maupun sesudah update)
+        rows = np.unique(rows)
+        n_users, n_books = user_item_matrix.shape
+        normalized, normalized_t = self.user_item_normalized, self.user_item_normalized_t
+        new_rows = normalize(user_item_matrix[rows], norm='l2', axis=1).tocsr().astype(normalized.dtype)
+
+        old_rows = normalized[rows[rows < normalized.shape[0]]]
+        touched_books = np.union1d(old_rows.indices, new_rows.indices)
+
+        # Entri lama pada baris buku yang tersentuh, tanpa entri milik user yang berubah
+        old_t = normalized_t[touched_books[touched_books < normalized_t.shape[0]]].tocoo()
+        keep = ~np.isin(old_t.col, rows)
+        new_coo = new_rows.tocoo()
+        t_rows = np.concatenate([old_t.row[keep], np.searchsorted(touched_books, new_coo.col)])
+        t_cols = np.concatenate([old_t.col[keep], rows[new_coo.row]])
+        t_data = np.concatenate([old_t.data[keep], new_coo.data])
+        new_t_rows = csr_matrix((t_data, (t_rows, t_cols)), shape=(len(touched_books), n_users))
+        new_t_rows.sort_indices()
+
+        self.user_item_normalized = replace_csr_rows(normalized, rows, new_rows, (n_users, n_books))
+        self.user_item_normalized_t = replace_csr_rows(normalized_t, touched_books, new_t_rows, (n_books, n_users))
+        self.shape = (n_users, n_users)
+
+        # Hanya daftar tetangga user yang similarity-nya berubah yang dibuang dari cache
+        if affected_users is None:
+            self.cache.clear()
+        else:
+            affected_users = set(np.asarray(affected_users).tolist())
+            for key in [key for key in self.cache if key[0] in affected_users]:
+                del self.cache[key]
+
+    @classmethod
+    def from_normalized(cls, user_item_normalized, user_item_normalized_t, cache_size=1024):
+        # Dipakai saat memuat artifact: matriks ternormalisasi sudah tersimpan, tidak perlu dihitung ulang
+        index = cls.__new__(cls)
+        index.cache_size = cache_size
+        index.cache = OrderedDict()
+        index.set_normalized(user_item_normalized, user_item_normalized_t)
+        return index
+
+    def __getitem__(self, idx):
+        # Satu baris similarity: hanya user yang pernah merating buku yang sama yang tersentuh
+        row = self.user_item_normalized[idx]
+        return (row @ self.user_item_normalized_t).toarray().ravel()
+
+    def neighbors(self, idx, k):
+        key = (idx, k)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        sim_scores = self[idx]
+        neighbor_idx = top_n_indices(sim_scores, k, exclude=idx)
+        result = (neighbor_idx, sim_scores[neighbor_idx])
+
+        if self.cache_size:
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+# Mode perhitungan similarity antar user:
+# - 'on_demand' : hanya baris user yang diminta yang dihitung (memori sebanding jumlah rating)
+# - 'full'      : seluruh matriks user x user dihitung di awal
+USER_SIMILARITY_MODE = 'on_demand'
+
+if USER_SIMILARITY_MODE == 'full':
+    user_similarity = cosine_similarity(user_item_matrix)
+else:
+    user_similarity = UserNeighborIndex(user_item_matrix, cache_size=1024)
+
+print('User Similarity Shape:', user_similarity.shape)
+#%% md
+# #### Menghitung Cosine Similarity Antar User
+# 
+# Pada tahap ini, kami menghitung skor kemiripan (similarity score) antar semua pengguna berdasarkan pola rating mereka terhadap buku.
+# 
+# **Teknik yang digunakan:**
+# - **Cosine Similarity**:
+#   Mengukur tingkat kesamaan antar vektor pengguna pada User-Item Matrix.
+#   Skor cosine similarity berkisar dari 0 (tidak mirip) hingga 1 (sangat mirip).
+# 
+# **Proses:**
+# - Buku yang belum dirating sudah bernilai 0 pada sparse matrix, sehingga tidak perlu `fillna(0)` dan tidak ada salinan dense dari User-Item Matrix.
+# - Terdapat dua mode perhitungan (`USER_SIMILARITY_MODE`):
+#   - `'full'`: menggunakan fungsi `cosine_similarity` dari scikit-learn untuk menghitung seluruh kombinasi pasangan user di awal.
+#   - `'on_demand'` (default): menggunakan class `UserNeighborIndex`. Setiap baris User-Item Matrix dinormalisasi L2 sekali, lalu similarity satu user terhadap semua user lain baru dihitung saat dibutuhkan (satu baris sparse dikalikan dengan matriks).
+# - Pada mode `'on_demand'`, daftar tetangga user yang baru saja diminta disimpan dalam cache LRU berukuran terbatas (`cache_size`), sehingga permintaan berulang untuk user yang sama tidak dihitung ulang.
+# - Method `update` menghitung ulang normalisasi ketika User-Item Matrix berubah (misalnya ada user atau rating baru) dan mengosongkan cache tetangga.
+# - Method `update_rows` hanya menormalisasi ulang baris user yang berubah dan menambal baris tersebut (beserta baris buku terkait pada transpose) dengan `replace_csr_rows`, lalu hanya membuang cache tetangga milik user yang terpengaruh.
+# 
+# **Alasan:**
+# - Fungsi `recommend_books_userbased` hanya membaca satu baris similarity per permintaan, sedangkan matriks penuh berukuran user x user tumbuh kuadratik terhadap jumlah user, baik dari sisi memori maupun waktu startup.
+# 
+# **Hasil:**
+# - Matriks cosine similarity penuh berukuran **(20.908, 20.908)** (sekitar 3,5 GB dalam float64) tidak lagi perlu dibentuk di awal.
+# - Artinya, **20.908 pengguna** tetap dapat dibandingkan satu sama lain, tetapi hanya untuk user yang sedang diminta rekomendasinya.
+#%%
+class RatingScaler:
+    # Min-max scaler untuk rating: min dan max dihitung sekali saat fit
+    def __init__(self, min_rating=None, max_rating=None):
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+
+    def fit(self, ratings):
+        ratings = np.asarray(ratings)
+        self.min_rating = float(ratings.min())
+        self.max_rating = float(ratings.max())
+        return self
+
+    def transform(self, ratings):
+        # Rating asli -> rentang [0, 1]
+        rating_range = (self.max_rating - self.min_rating) or 1.0
+        return (np.asarray(ratings, dtype=np.float32) - self.min_rating) / rating_range
+
+    def inverse_transform(self, scaled_ratings):
+        # Rentang [0, 1] (misalnya output sigmoid) -> skala rating asli
+        rating_range = (self.max_rating - self.min_rating) or 1.0
+        return np.asarray(scaled_ratings, dtype=np.float32) * rating_range + self.min_rating
+
+    def fit_transform(self, ratings):
+        return self.fit(ratings).transform(ratings)
+#%% md
+# #### Membuat Rating Scaler
+# 
+# Pada tahap ini, kami membuat class `RatingScaler` untuk normalisasi min-max pada rating.
+# 
+# **Teknik yang digunakan:**
+# - `fit`: menghitung nilai minimum dan maksimum rating sekali saja, lalu menyimpannya.
+# - `transform`: mengubah rating ke rentang [0, 1] secara vektorisasi, `(rating - min) / (max - min)`.
+# - `inverse_transform`: mengembalikan nilai pada rentang [0, 1] (misalnya output sigmoid dari `RecommenderNet`) ke skala rating asli 1–10.
+# 
+# **Alasan:**
+# - Normalisasi sebelumnya memakai `apply(lambda ...)` yang menghitung ulang `min()` dan `max()` seluruh kolom untuk setiap baris, sehingga kompleksitasnya O(n²).
+# - Dengan scaler yang di-fit sekali, normalisasi menjadi O(n), dan parameter yang sama dapat dipakai kembali saat inferensi.
+#%%
 # Shuffle dataset
 ratings_clean = ratings_clean.sample(frac=1, random_state=42)
 
 # Membuat variabel x (fitur) dan y (target)
 x = ratings_clean[['user', 'book']].values
-y = ratings_clean['book_rating'].apply(lambda x: (x - ratings_clean['book_rating'].min()) / (ratings_clean['book_rating'].max() - ratings_clean['book_rating'].min())).values
+rating_scaler = RatingScaler().fit(ratings_clean['book_rating'].values)
+y = rating_scaler.transform(ratings_clean['book_rating'].values)
 
 # Membagi data 80% train, 20% validation
 train_indices = int(0.8 * ratings_clean.shape[0])
@@ -984,7 +1478,7 @@ print(f"Shape x_val: {x_val.shape}, y_val: {y_val.shape}")
 # Pada tahap ini, dataset diacak (shuffled) dan dibagi menjadi dua bagian: training dan validation set, dengan rasio 80:20.
 # 
 # - **x** berisi pasangan fitur `(user, book)`.
-# - **y** berisi target `book_rating` yang telah dinormalisasi ke rentang [0,1].
+# - **y** berisi target `book_rating` yang telah dinormalisasi ke rentang [0,1] menggunakan `rating_scaler`.
 # 
 # **Hasil Split:**
 # - Shape `x_train`: **(163.080, 2)**
@@ -1087,22 +1581,23 @@ print(f"Shape x_val: {x_val.shape}, y_val: {y_val.shape}")
 # - Cosine Similarity untuk mengukur kemiripan antar vektor TF-IDF dari judul buku.
 # 
 # **Proses dan Alasan**:
-# - Dengan menghitung cosine similarity antara semua pasangan judul buku, kita dapat mengetahui seberapa mirip satu buku dengan yang lain berdasarkan judulnya.
+# - Dengan menghitung cosine similarity antar judul buku, kita dapat mengetahui seberapa mirip satu buku dengan yang lain berdasarkan judulnya.
+# - Perhitungan dilakukan per blok baris dan hanya Top-50 tetangga per buku yang disimpan, sehingga memori tidak tumbuh kuadratik terhadap jumlah buku.
 # - Skor similarity digunakan untuk mengidentifikasi buku-buku serupa dan menghasilkan rekomendasi secara Content-Based.
 # 
 # **Hasil**:
-# - Matriks similarity berukuran **(24.253, 24.253)**, di mana setiap nilai menunjukkan skor kemiripan antara dua judul buku.
+# - Indeks tetangga sparse berukuran **(24.253, 24.253)** dengan 50 nilai per baris, di mana setiap nilai menunjukkan skor kemiripan antara dua judul buku.
 # 
 # ---
 # 
 # ### Membuat User-Item Matrix
 # 
 # **Teknik yang digunakan**:
-# - Membuat pivot table dengan baris sebagai `user_id`, kolom sebagai `isbn`, dan nilai sebagai `book_rating`.
+# - Membuat sparse matrix CSR dengan baris sebagai `user`, kolom sebagai `book` (hasil encoding), dan nilai sebagai `book_rating`.
 # 
 # **Proses dan Alasan**:
 # - Matriks ini digunakan sebagai input untuk pendekatan User-Based Collaborative Filtering.
-# - Karena sebagian besar user tidak me-review semua buku, sebagian besar isi matriks berupa nilai `NaN`.
+# - Karena sebagian besar user tidak me-review semua buku, hanya sel yang berisi rating yang disimpan, sehingga memori sebanding dengan jumlah rating.
 # 
 # **Hasil**:
 # - User-Item Matrix berukuran **(20.908, 25.790)**, menunjukkan 20.908 pengguna dan 25.790 buku unik.
@@ -1112,14 +1607,15 @@ print(f"Shape x_val: {x_val.shape}, y_val: {y_val.shape}")
 # ### Menghitung Cosine Similarity Antar User
 # 
 # **Teknik yang digunakan**:
-# - Cosine Similarity antar baris pada User-Item Matrix yang telah diisi `NaN`-nya dengan angka 0.
+# - Cosine Similarity antar baris pada User-Item Matrix sparse (buku yang belum dirating bernilai 0).
 # 
 # **Proses dan Alasan**:
 # - Kemiripan antar user digunakan untuk mendeteksi user dengan preferensi yang serupa.
 # - Cosine similarity dipilih karena robust terhadap skala rating dan sparsity.
+# - Secara default similarity dihitung on-demand per user (`UserNeighborIndex`) dengan cache LRU, sehingga memori dan waktu startup tidak tumbuh kuadratik terhadap jumlah user.
 # 
 # **Hasil**:
-# - Matriks similarity antar user berukuran **(20.908, 20.908)**, digunakan untuk menghasilkan rekomendasi berdasarkan user yang mirip.
+# - Similarity antar user berukuran **(20.908, 20.908)** secara logis, digunakan untuk menghasilkan rekomendasi berdasarkan user yang mirip tanpa membentuk matriks penuh.
 # 
 # ---
 # 
@@ -1193,7 +1689,7 @@ print(f"Shape x_val: {x_val.shape}, y_val: {y_val.shape}")
 # 
 # **Proses dan Alasan**:
 # - Data diacak dan dibagi menjadi training dan validation set agar model dapat dilatih dan diuji performanya secara terpisah.
-# - Fitur `x` terdiri dari pasangan `(user, book)`, sedangkan target `y` adalah `book_rating`.
+# - Fitur `x` terdiri dari pasangan `(user, book)`, sedangkan target `y` adalah `book_rating` yang dinormalisasi min-max dengan `RatingScaler` (min dan max dihitung sekali, lalu ditransformasi secara vektorisasi).
 # 
 # **Hasil**:
 # - Jumlah data training: **163.080**
@@ -1202,40 +1698,84 @@ print(f"Shape x_val: {x_val.shape}, y_val: {y_val.shape}")
 # ---
 #%% md
 # # Modeling
-#%% md
-# ## Model Development dengan Content Based Filtering
 #%%
-def recommend_books(title, top_n=5):
-    # Cek apakah buku ada di dataset
-    if title not in books_filtered['Book-Title'].values:
-        return f"Buku '{title}' tidak ditemukan di database."
+def top_n_indices(scores, top_n, exclude=None):
+    # Pilih index dengan skor tertinggi tanpa sorting penuh (O(N) dengan np.partition)
+    scores = np.asarray(scores)
+    exclude = np.atleast_1d(exclude) if exclude is not None else np.empty(0, dtype=np.intp)
 
-    # Cari index buku berdasarkan judul
-    idx = books_filtered[books_filtered['Book-Title'] == title].index[0]
+    # Ambil kandidat lebih banyak sebanyak jumlah index yang dikecualikan
+    n_candidates = min(top_n + len(exclude), len(scores))
+    if n_candidates <= 0:
+        return np.empty(0, dtype=np.intp)
 
-    # Ambil skor cosine similarity untuk buku tersebut
-    sim_scores = list(enumerate(cosine_sim[idx]))
+    # Nilai ambang Top-N, semua skor di atasnya pasti masuk kandidat
+    kth = len(scores) - n_candidates
+    threshold = np.partition(scores, kth)[kth]
+    above = np.flatnonzero(scores > threshold)
 
-    # Urutkan skor dari tinggi ke rendah (kecuali dirinya sendiri [index 0])
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+    # Skor yang sama dengan ambang diambil dari index terkecil (sama seperti sorted() yang stabil)
+    ties = np.flatnonzero(scores == threshold)[:n_candidates - len(above)]
+    candidates = np.concatenate([above, ties])
 
-    # Ambil top_n skor tertinggi (skip index 0 karena itu dirinya sendiri)
-    sim_scores = sim_scores[1:top_n+1]
+    # Buang index yang dikecualikan (misalnya dirinya sendiri)
+    if len(exclude):
+        candidates = candidates[~np.isin(candidates, exclude)]
+
+    # Urutkan kandidat saja: skor tertinggi dulu, lalu index terkecil
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:top_n]
+#%% md
+# #### Membuat Fungsi Seleksi Top-N
+# 
+# Pada tahap ini, kami membuat fungsi `top_n_indices` yang digunakan bersama oleh fungsi-fungsi rekomendasi untuk memilih Top-N skor tertinggi.
+# 
+# **Teknik yang digunakan:**
+# - **Partial Sort**: `np.partition` mencari nilai ambang Top-N dalam waktu linear, tanpa mengurutkan seluruh skor.
+# - **Self-Exclusion**: index yang dikecualikan (misalnya user atau buku itu sendiri) dibuang langsung pada array kandidat.
+# - **Tie-Handling**: skor yang sama diurutkan berdasarkan index terkecil, sehingga hasilnya sama dengan `sorted()` yang stabil.
+# 
+# **Tujuan:**
+# - Menggantikan pola `sorted(list(enumerate(...)))` yang membuat tuple Python untuk setiap buku/user dan berjalan dalam O(N log N) di setiap query.
+#%% md
+# ## Model Development dengan Content Based Filtering
+#%%
+def recommend_books_by_index(idx, top_n=5):
+    # Ambil tetangga buku tersebut dari indeks Top-K (sudah terurut dan tanpa dirinya sendiri)
+    start, end = content_neighbors.indptr[idx], content_neighbors.indptr[idx + 1]
 
-    # Ambil index buku-buku yang mirip
-    book_indices = [i[0] for i in sim_scores]
+    # Ambil index buku-buku yang mirip (maksimal sebanyak Top-K yang disimpan)
+    book_indices = content_neighbors.indices[start:end][:top_n]
 
     # Tampilkan judul buku rekomendasi
     return books_filtered.iloc[book_indices][['Book-Title', 'Book-Author']]
+
+def recommend_books(title, top_n=5):
+    # Cari semua baris buku dengan judul tersebut
+    book_rows = title_to_indices.get(title)
+    if book_rows is None:
+        return f"Buku '{title}' tidak ditemukan di database."
+
+    # Jika ada beberapa edisi dengan judul sama, edisi pertama dipakai sebagai acuan (canonical)
+    return recommend_books_by_index(book_rows[0], top_n)
+
+def recommend_books_by_isbn(isbn, top_n=5):
+    # Cari baris buku berdasarkan ISBN
+    idx = isbn_to_index.get(isbn)
+    if idx is None:
+        return f"Buku dengan ISBN '{isbn}' tidak ditemukan di database."
+
+    return recommend_books_by_index(idx, top_n)
 #%% md
 # #### Membuat Fungsi Rekomendasi Berdasarkan Judul Buku
 # 
 # Pada tahap ini, kami membangun fungsi rekomendasi untuk memberikan rekomendasi Top-N buku yang mirip berdasarkan kemiripan judul.
 # 
 # **Teknik yang digunakan:**
-# - Menggunakan hasil **Cosine Similarity Matrix**.
-# - Menemukan index buku berdasarkan judul.
-# - Mengurutkan skor kemiripan dan memilih Top-N buku dengan skor tertinggi.
+# - Menggunakan indeks **Top-K Cosine Similarity** (`content_neighbors`).
+# - Menemukan index buku berdasarkan judul melalui `title_to_indices`, atau berdasarkan ISBN melalui `isbn_to_index` (fungsi `recommend_books_by_isbn`).
+# - Jika satu judul memiliki beberapa edisi (ISBN berbeda), edisi pertama dipakai sebagai acuan. Edisi lain dengan judul yang sama tetap dapat muncul sebagai rekomendasi.
+# - Mengambil Top-N tetangga yang sudah terurut dari skor tertinggi, sehingga tidak perlu mengurutkan ulang seluruh buku setiap kali fungsi dipanggil.
 # 
 # **Tujuan:**
 # - Memberikan rekomendasi buku serupa untuk pengguna berdasarkan preferensi terhadap suatu buku tertentu.
@@ -1270,42 +1810,92 @@ recommend_books('Harry Potter and the Chamber of Secrets (Book 2)')
 #%% md
 # ## Model Development dengan Collaborative Filtering
 #%%
-def recommend_books_userbased(user_id, user_item_matrix, user_similarity, books_filtered, top_n=5):
-    if user_id not in user_item_matrix.index:
-        return f"User ID {user_id} tidak ditemukan dalam data."
+# Tabel metadata buku dengan urutan baris yang sama dengan hasil encoding `book`
+book_metadata = (
+    books_filtered.drop_duplicates('ISBN')
+    .set_index('ISBN')
+    .reindex(isbn_encoder.classes_)[['Book-Title', 'Book-Author']]
+    .rename_axis('ISBN')
+    .reset_index()
+)
+
+print('Book Metadata Shape:', book_metadata.shape)
+print('Jumlah buku tanpa metadata:', book_metadata['Book-Title'].isna().sum())
+#%% md
+# #### Membuat Tabel Metadata Buku Berdasarkan Encoding
+# 
+# Pada tahap ini, kami menyiapkan tabel `book_metadata` yang berisi `ISBN`, `Book-Title`, dan `Book-Author` untuk setiap buku hasil encoding.
+# 
+# **Proses:**
+# - Baris ke-i pada `book_metadata` adalah buku dengan encoding `book = i` (sama dengan kolom ke-i pada User-Item Matrix).
+# - ISBN yang tidak ada di `books_filtered` tetap memiliki baris, tetapi dengan `Book-Title` dan `Book-Author` bernilai NaN.
+# 
+# **Tujuan:**
+# - Metadata hasil rekomendasi cukup diambil dengan indexing array (`iloc`) berdasarkan encoding buku, tanpa perlu `isin` dan `merge` terhadap seluruh `books_filtered` di setiap permintaan.
+#%%
+def userbased_scores(idx, user_item_matrix, user_similarity, n_neighbors=5, min_support=1,
+                     weighted=False, mean_centered=False):
+    # Skor semua buku kandidat untuk satu user (index encoded), tanpa memilih Top-N
+
+    # Ambil Top-k user dengan similarity terbesar (kecuali dirinya sendiri)
+    if isinstance(user_similarity, UserNeighborIndex):
+        similar_users_idx, similar_users_sim = user_similarity.neighbors(idx, n_neighbors)
+    else:
+        similar_users_idx = top_n_indices(user_similarity[idx], n_neighbors, exclude=idx)
+        similar_users_sim = user_similarity[idx][similar_users_idx]
+
+    # Ambil semua buku yang pernah dirating oleh user-user mirip (hanya entri sparse-nya)
+    neighbor_ratings = user_item_matrix[similar_users_idx]
+    neighbor_counts = np.diff(neighbor_ratings.indptr)
+    entry_neighbor = np.repeat(np.arange(len(similar_users_idx)), neighbor_counts)
+    ratings = neighbor_ratings.data
 
-    # Ambil index user
-    idx = user_item_matrix.index.get_loc(user_id)
+    # Mean-centering: gunakan selisih rating terhadap rata-rata rating masing-masing user mirip
+    if mean_centered:
+        neighbor_means = np.bincount(entry_neighbor, weights=ratings, minlength=len(similar_users_idx)) / np.maximum(neighbor_counts, 1)
+        ratings = ratings - neighbor_means[entry_neighbor]
 
-    # Ambil skor similarity user target terhadap semua user lain
-    sim_scores = list(enumerate(user_similarity[idx]))
+    # Bobot setiap rating: similarity user mirip (weighted) atau 1 (rata-rata biasa)
+    weights = similar_users_sim[entry_neighbor] if weighted else np.ones_like(ratings)
 
-    # Urutkan berdasarkan similarity terbesar (kecuali dirinya sendiri)
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
+    # Skor setiap buku dari user-user mirip yang merating buku tersebut
+    candidate_books, position = np.unique(neighbor_ratings.indices, return_inverse=True)
+    weighted_sum = np.bincount(position, weights=weights * ratings)
+    weight_total = np.bincount(position, weights=np.abs(weights))
+    support = np.bincount(position)
 
-    # Ambil user-user mirip
-    similar_users_idx = [i[0] for i in sim_scores[1:6]]  # top 5 user mirip
-    similar_users = user_item_matrix.index[similar_users_idx]
+    # Buang buku yang sudah pernah dirating user target atau dirating terlalu sedikit user mirip
+    user_books = user_item_matrix.indices[user_item_matrix.indptr[idx]:user_item_matrix.indptr[idx + 1]]
+    valid = ~np.isin(candidate_books, user_books) & (support >= min_support) & (weight_total > 0)
+    candidate_books = candidate_books[valid]
+    scores = weighted_sum[valid] / weight_total[valid]
 
-    # Ambil semua buku yang dirating tinggi oleh user-user mirip
-    books_recommend = user_item_matrix.loc[similar_users]
-    books_recommend = books_recommend.mean(axis=0)  # Rata-rata rating dari user-user mirip
-    books_recommend = books_recommend.sort_values(ascending=False)
+    # Kembalikan skor ke skala rating user target
+    if mean_centered:
+        user_ratings = user_item_matrix.data[user_item_matrix.indptr[idx]:user_item_matrix.indptr[idx + 1]]
+        scores = scores + (user_ratings.mean() if len(user_ratings) else 0.0)
 
-    # Ambil buku yang user belum pernah rating
-    user_books = user_item_matrix.loc[user_id]
-    unseen_books = books_recommend[user_books.isna()]
+    return candidate_books, scores
 
-    # Ambil Top-N ISBN dan ratingnya
-    top_books = unseen_books.head(top_n)
+def recommend_books_userbased(user_id, user_item_matrix, user_similarity, book_metadata, top_n=5,
+                              n_neighbors=5, min_support=1, weighted=False, mean_centered=False, encoder=None):
+    # Ambil index user (baris pada User-Item Matrix); -1 berarti user tidak dikenal
+    if encoder is None:
+        encoder = user_encoder
+    idx = encoder.encode([user_id])[0]
+    if idx < 0:
+        return f"User ID {user_id} tidak ditemukan dalam data."
+
+    candidate_books, scores = userbased_scores(idx, user_item_matrix, user_similarity, n_neighbors,
+                                               min_support, weighted, mean_centered)
 
-    # Buat DataFrame hasil
-    recommendations = books_filtered[books_filtered['ISBN'].isin(top_books.index)][['ISBN', 'Book-Title', 'Book-Author']]
+    # Ambil Top-N buku dengan skor tertinggi
+    top_books = top_n_indices(scores, top_n)
 
-    # Merge dengan average rating
-    recommendations = recommendations.merge(top_books.reset_index(), left_on='ISBN', right_on='isbn')
-    recommendations = recommendations.rename(columns={0: 'Average-Rating'})
-    recommendations = recommendations[['ISBN', 'Book-Title', 'Book-Author', 'Average-Rating']]
+    # Buat DataFrame hasil dari tabel metadata (buku tanpa metadata dibuang)
+    recommendations = book_metadata.iloc[candidate_books[top_books]].copy()
+    recommendations['Average-Rating'] = scores[top_books]
+    recommendations = recommendations.dropna(subset=['Book-Title'])
 
     return recommendations.reset_index(drop=True)
 #%% md
@@ -1320,22 +1910,33 @@ def recommend_books_userbased(user_id, user_item_matrix, user_similarity, books_
 # 
 # **Alur Proses Fungsi:**
 # 1. Menghitung skor similarity user target terhadap semua user lain.
-# 2. Memilih Top-5 user paling mirip (selain dirinya sendiri).
-# 3. Mengambil rata-rata rating buku yang dirating oleh user-user mirip.
-# 4. Menyaring buku-buku yang belum pernah dirating oleh user target.
-# 5. Mengambil Top-N buku dengan rata-rata rating tertinggi.
-# 6. Menggabungkan ISBN buku dengan informasi judul buku (`Book-Title`) dan penulis (`Book-Author`).
-# 7. Menambahkan rata-rata rating (`Average-Rating`) ke hasil rekomendasi.
+# 2. Memilih Top-k user paling mirip (selain dirinya sendiri) menggunakan `top_n_indices`, dengan k = `n_neighbors` (default 5).
+# 3. Mengambil rata-rata rating buku yang dirating oleh user-user mirip. Perhitungan dilakukan dengan `np.bincount` langsung pada entri sparse user-user mirip, sehingga hanya buku yang pernah mereka rating yang diproses.
+# 4. Menyaring buku-buku yang belum pernah dirating oleh user target (`np.isin` terhadap baris CSR user target) dan buku yang dirating oleh kurang dari `min_support` user mirip.
+# 5. Mengambil Top-N buku dengan rata-rata rating tertinggi menggunakan `top_n_indices`.
+# 6. Mengambil informasi judul buku (`Book-Title`) dan penulis (`Book-Author`) dari `book_metadata` berdasarkan encoding buku.
+# 7. Menambahkan rata-rata rating (`Average-Rating`) ke hasil rekomendasi, terurut dari yang tertinggi.
+# 
+# Langkah 1-4 dipisahkan ke fungsi `userbased_scores` (input: index encoded user), sehingga dapat dipakai ulang oleh batch job untuk semua user.
+# 
+# **Parameter Tambahan:**
+# - `n_neighbors`: jumlah user mirip yang digunakan (k), dapat disesuaikan dengan kebutuhan.
+# - `weighted=True`: rating setiap user mirip diberi bobot sesuai skor similarity-nya, sehingga skor buku = Σ(sim × rating) / Σ|sim|. Buku yang dirating oleh user yang lebih mirip akan mendapat skor lebih tinggi.
+# - `min_support`: jumlah minimum user mirip yang harus merating sebuah buku agar buku tersebut dapat direkomendasikan. Ini mencegah buku yang hanya dirating oleh satu user mendapat skor setara dengan buku yang dirating oleh banyak user.
+# - `mean_centered=True`: rating setiap user mirip dikurangi rata-rata rating user tersebut, lalu hasilnya ditambahkan kembali dengan rata-rata rating user target. Cara ini mengoreksi perbedaan kebiasaan memberi rating (ada user yang selalu memberi rating tinggi, ada yang pelit).
+# - Dengan nilai default (`n_neighbors=5`, `min_support=1`, `weighted=False`, `mean_centered=False`), hasilnya sama dengan rata-rata rating biasa dari 5 user paling mirip.
+# - Seluruh perhitungan dilakukan secara vektorisasi pada entri sparse, sehingga nilai k yang lebih besar tetap murah.
+# - `encoder`: `IDEncoder` untuk User-ID (default `user_encoder` global), misalnya encoder milik `IncrementalUpdater` atau artifact serving.
 # 
 # **Tujuan:**
 # - Memberikan rekomendasi buku yang berpotensi disukai berdasarkan perilaku pengguna lain yang serupa.
 #%%
 # Contoh Menjalankan Rekomendasi User-Based Collaborative Filtering
 # Pilih contoh user_id yang ada
-example_user = user_item_matrix.index[0]  # ambil user pertama misal
+example_user = user_encoder.classes_.min()  # ambil user dengan User-ID terkecil
 
 print(f"Rekomendasi untuk User ID: {example_user}")
-recommend_books_userbased(example_user, user_item_matrix, user_similarity, books_filtered, top_n=5)
+recommend_books_userbased(example_user, user_item_matrix, user_similarity, book_metadata, top_n=5)
 #%% md
 # #### Contoh Hasil Rekomendasi User-Based Collaborative Filtering
 # 
@@ -1361,6 +1962,24 @@ recommend_books_userbased(example_user, user_item_matrix, user_similarity, books
 # 
 # **Catatan:**
 # - Hanya 3 rekomendasi yang berhasil ditampilkan karena hanya 3 ISBN yang cocok dengan data buku yang tersedia (`books_filtered`).
+#%%
+# Contoh rekomendasi dengan lebih banyak user mirip, bobot similarity, minimum support, dan mean-centering
+print(f"Rekomendasi (weighted, k=20) untuk User ID: {example_user}")
+recommend_books_userbased(
+    example_user, user_item_matrix, user_similarity, book_metadata, top_n=5,
+    n_neighbors=20, min_support=2, weighted=True, mean_centered=True
+)
+#%% md
+# #### Contoh Rekomendasi User-Based dengan Skor Berbobot Similarity
+# 
+# Pada tahap ini, kami menjalankan fungsi yang sama untuk user yang sama, tetapi dengan konfigurasi berikut:
+# 
+# - `n_neighbors=20`: menggunakan 20 user paling mirip.
+# - `min_support=2`: buku harus dirating oleh minimal 2 dari 20 user mirip.
+# - `weighted=True`: rating diberi bobot sesuai similarity user mirip.
+# - `mean_centered=True`: rating dinormalisasi terhadap rata-rata rating masing-masing user.
+# 
+# Dengan konfigurasi ini, buku yang disukai oleh beberapa user yang sangat mirip akan lebih diutamakan dibandingkan buku yang kebetulan diberi rating 10 oleh satu user saja. Nilai k dan `min_support` dapat disesuaikan untuk setiap kebutuhan (workload).
 #%% md
 # ## Model Development dengan Collaborative Filtering menggunakan Keras
 #%%
@@ -1369,6 +1988,12 @@ import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
 
+@tf.function(jit_compile=True)
+def score_user_book(user_vector, user_bias, book_vector, book_bias):
+    # Dot product per pasangan (user, buku), digabung dengan bias dan sigmoid dalam satu kernel XLA
+    dot_user_book = tf.reduce_sum(user_vector * book_vector, axis=1, keepdims=True)
+    return tf.nn.sigmoid(dot_user_book + user_bias + book_bias)
+
 # Build class RecommenderNet
 class RecommenderNet(tf.keras.Model):
 
@@ -1402,10 +2027,7 @@ class RecommenderNet(tf.keras.Model):
         book_vector = self.book_embedding(inputs[:, 1])
         book_bias = self.book_bias(inputs[:, 1])
 
-        dot_user_book = tf.tensordot(user_vector, book_vector, 2)
-        x = dot_user_book + user_bias + book_bias
-
-        return tf.nn.sigmoid(x)
+        return score_user_book(user_vector, user_bias, book_vector, book_bias)
 #%% md
 # #### Membangun Class Model RecommenderNet
 # 
@@ -1415,18 +2037,88 @@ class RecommenderNet(tf.keras.Model):
 # - **User Embedding Layer**: Membentuk representasi vektor laten untuk setiap user.
 # - **Book Embedding Layer**: Membentuk representasi vektor laten untuk setiap buku.
 # - **Bias Layer**: Menambahkan bias untuk setiap user dan setiap buku.
-# - **Dot Product**: Menghitung tingkat kecocokan antara user dan buku.
+# - **Dot Product**: Menghitung tingkat kecocokan antara user dan buku, yaitu satu dot product untuk setiap pasangan (user, buku) dalam batch.
 # - **Activation Function**: Sigmoid, untuk membatasi skor prediksi pada rentang [0,1].
 # 
+# Dot product, penjumlahan bias, dan sigmoid digabung dalam satu fungsi `score_user_book` yang dikompilasi dengan `tf.function(jit_compile=True)`, sehingga XLA dapat menjalankannya sebagai satu kernel tanpa tensor perantara.
+# 
 # Model ini bertujuan untuk mempelajari interaksi antara user dan item secara efisien melalui representasi embedding.
 #%%
+import time
+
+def make_dataset(x, y, batch_size, shuffle=True, shuffle_buffer=None, seed=42):
+    # Pipeline tf.data: shuffle per epoch, batch besar, dan prefetch agar CPU tidak menunggu data
+    dataset = tf.data.Dataset.from_tensor_slices((x.astype(np.int32), y.astype(np.float32)))
+    if shuffle:
+        dataset = dataset.shuffle(shuffle_buffer or len(x), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def scaled_learning_rate(base_learning_rate, base_batch_size, batch_size, rule='sqrt'):
+    # Learning rate ikut dinaikkan saat batch size diperbesar
+    ratio = batch_size / base_batch_size
+    if rule == 'linear':
+        return base_learning_rate * ratio
+    if rule == 'sqrt':
+        return base_learning_rate * np.sqrt(ratio)
+    raise ValueError(f"Aturan scaling tidak dikenal: {rule}")
+
+class ThroughputCallback(keras.callbacks.Callback):
+    # Mencatat throughput training (examples/detik) per epoch, tanpa waktu validasi
+    def __init__(self, num_examples):
+        super().__init__()
+        self.num_examples = num_examples
+        self.examples_per_sec = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start = time.perf_counter()
+        self.train_end = None
+
+    def on_test_begin(self, logs=None):
+        if self.train_end is None:
+            self.train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        train_end = self.train_end or time.perf_counter()
+        self.examples_per_sec.append(self.num_examples / (train_end - self.epoch_start))
+        if logs is not None:
+            logs['examples_per_sec'] = self.examples_per_sec[-1]
+
+# Mode training: 'tf_data' (batch besar dengan pipeline tf.data) atau 'numpy' (batch 8 dari array NumPy seperti semula)
+TRAINING_MODE = 'tf_data'
+BASE_BATCH_SIZE = 8
+BASE_LEARNING_RATE = 0.001
+
+if TRAINING_MODE == 'tf_data':
+    BATCH_SIZE = 1024
+    SHUFFLE_BUFFER = 100_000
+else:
+    BATCH_SIZE = BASE_BATCH_SIZE
+
+learning_rate = scaled_learning_rate(BASE_LEARNING_RATE, BASE_BATCH_SIZE, BATCH_SIZE)
+print(f"Mode training: {TRAINING_MODE}, batch size: {BATCH_SIZE}, learning rate: {learning_rate:.4f}")
+#%% md
+# #### Pipeline Training dengan tf.data dan Batch Besar
+# 
+# Pada tahap ini, kami menyiapkan mode training alternatif untuk `RecommenderNet`.
+# 
+# **Teknik yang digunakan:**
+# - `make_dataset`: membangun pipeline `tf.data` dengan shuffle buffer (diacak ulang setiap epoch), batch besar, dan `prefetch(tf.data.AUTOTUNE)` sehingga batch berikutnya disiapkan selagi batch saat ini dilatih.
+# - `scaled_learning_rate`: menaikkan learning rate sebanding dengan akar rasio batch size (aturan `sqrt`, cocok untuk Adam) atau secara linear (aturan `linear`).
+# - `ThroughputCallback`: callback Keras yang mencatat jumlah contoh per detik pada setiap epoch (hanya waktu training, tanpa validasi).
+# 
+# **Alasan:**
+# - Dengan batch size 8, satu epoch terdiri dari puluhan ribu langkah optimizer kecil sehingga CPU lebih banyak menganggur dibanding bekerja.
+# - Batch besar dengan learning rate yang disesuaikan memperpendek waktu per epoch, sehingga retraining muat dalam jendela waktu yang tetap.
+# 
+# Mode `numpy` tetap tersedia untuk mereproduksi konfigurasi training semula (batch size 8, learning rate 0.001).
+#%%
 # Inisialisasi model
 model = RecommenderNet(num_users, num_books, embedding_size=50)
 
 # Compile model
 model.compile(
     loss=tf.keras.losses.BinaryCrossentropy(),
-    optimizer=keras.optimizers.Adam(learning_rate=0.001),
+    optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
     metrics=[tf.keras.metrics.RootMeanSquaredError()]
 )
 #%% md
@@ -1435,13 +2127,44 @@ model.compile(
 # Setelah membangun arsitektur model, kami melakukan inisialisasi dan kompilasi model dengan spesifikasi sebagai berikut:
 # 
 # - **Loss Function**: Binary Crossentropy
-# - **Optimizer**: Adam Optimizer (learning rate = 0.001)
+# - **Optimizer**: Adam Optimizer (learning rate = 0.001 untuk batch size 8, disesuaikan dengan `scaled_learning_rate` pada mode `tf_data`)
 # - **Evaluation Metric**: Root Mean Squared Error (RMSE)
 # 
 # Loss function binary crossentropy dipilih karena model memprediksi probabilitas keterkaitan user-buku dalam rentang [0,1].
 # 
 # Model siap dilatih setelah proses kompilasi ini.
 #%%
+# Regression check: skor harus dihitung per pasangan (user, buku), bukan satu skalar untuk seluruh batch
+sample_pairs = x_train[:64]
+sample_scores = model(sample_pairs).numpy().ravel()
+
+user_weights = model.user_embedding.get_weights()[0]
+book_weights = model.book_embedding.get_weights()[0]
+expected_logits = (
+    np.sum(user_weights[sample_pairs[:, 0]] * book_weights[sample_pairs[:, 1]], axis=1)
+    + model.user_bias.get_weights()[0][sample_pairs[:, 0], 0]
+    + model.book_bias.get_weights()[0][sample_pairs[:, 1], 0]
+)
+expected_scores = 1 / (1 + np.exp(-expected_logits))
+
+assert sample_scores.shape == (len(sample_pairs),)
+assert len(np.unique(sample_scores)) > 1, "Skor per pasangan tidak boleh identik untuk seluruh batch"
+assert np.allclose(sample_scores, expected_scores, atol=1e-5)
+print('Skor per pasangan sesuai dengan dot product per baris')
+#%% md
+# #### Regression Check Skor per Pasangan User-Buku
+# 
+# Pada tahap ini, kami memastikan bahwa `RecommenderNet` menghasilkan skor yang berbeda untuk setiap pasangan (user, buku) dalam satu batch.
+# 
+# **Proses:**
+# - Mengambil 64 pasangan dari data training dan menghitung skornya dengan model.
+# - Menghitung skor yang diharapkan secara manual dengan NumPy: `sigmoid(sum(u * b) + bias_user + bias_buku)` per baris.
+# - Memastikan skor tidak identik untuk seluruh batch dan sama dengan perhitungan manual.
+# 
+# **Alasan:**
+# - Versi sebelumnya menggunakan `tf.tensordot(user_vector, book_vector, 2)`, yang mengkontraksi sumbu batch dan sumbu embedding sekaligus sehingga menghasilkan satu skalar yang di-broadcast ke semua pasangan dalam batch.
+# - Skoring per pasangan yang benar merupakan syarat untuk optimasi batching dan throughput berikutnya.
+#%%
 from tensorflow.keras.callbacks import EarlyStopping
 
 # Setup EarlyStopping
@@ -1451,22 +2174,36 @@ early_stop = EarlyStopping(
     restore_best_weights=True # Balikin ke model dengan bobot terbaik
 )
 
+throughput = ThroughputCallback(len(x_train))
+
 # Retraining dengan EarlyStopping
-history = model.fit(
-    x=x_train,
-    y=y_train,
-    batch_size=8,
-    epochs=100,
-    validation_data=(x_val, y_val),
-    callbacks=[early_stop]
-)
+if TRAINING_MODE == 'tf_data':
+    train_dataset = make_dataset(x_train, y_train, BATCH_SIZE, shuffle_buffer=SHUFFLE_BUFFER)
+    val_dataset = make_dataset(x_val, y_val, BATCH_SIZE, shuffle=False)
+    history = model.fit(
+        train_dataset,
+        epochs=100,
+        validation_data=val_dataset,
+        callbacks=[early_stop, throughput]
+    )
+else:
+    history = model.fit(
+        x=x_train,
+        y=y_train,
+        batch_size=BATCH_SIZE,
+        epochs=100,
+        validation_data=(x_val, y_val),
+        callbacks=[early_stop, throughput]
+    )
+
+print(f"Throughput training rata-rata: {np.mean(throughput.examples_per_sec):,.0f} examples/detik")
 #%% md
 # #### Training Model RecommenderNet
 # 
 # Pada tahap ini, model `RecommenderNet` dilatih menggunakan dataset yang telah dibagi menjadi training dan validation set.
 # 
 # **Spesifikasi Training:**
-# - Batch Size: 8
+# - Batch Size: 8 (mode `numpy`) atau 1024 melalui pipeline `tf.data` (mode `tf_data`)
 # - Epochs: 100
 # - Optimizer: Adam
 # - Loss Function: Binary Crossentropy
@@ -1478,65 +2215,1227 @@ history = model.fit(
 # - Model menunjukkan tren learning curve yang stabil dan tidak mengalami overfitting besar.
 # 
 # Model berhenti pada epoch 14 dengan performa terbaik pada data validasi.
+# 
+# Throughput training (examples/detik) per epoch dicatat oleh `ThroughputCallback` dan juga tersedia di `history.history['examples_per_sec']`.
 #%%
-import numpy as np
-
-# Ambil 1 contoh user random
-user_id = ratings_clean['user_id'].sample(1).iloc[0]
-print(f"Testing rekomendasi untuk User ID: {user_id}")
+class SparseEmbeddingTrainer:
+    # Training loop custom untuk RecommenderNet: hanya baris embedding yang muncul di batch yang di-update
+    def __init__(self, model, learning_rate=0.1, l2=1e-6, initial_accumulator=0.1):
+        self.model = model
+        self.learning_rate = learning_rate
+        self.l2 = l2
 
-# Cari buku yang pernah dirating user ini
-books_rated_by_user = ratings_clean[ratings_clean['user_id'] == user_id]
+        # Tabel embedding dan bias sebagai tf.Variable, beserta akumulator Adagrad per tabel
+        self.tables = [
+            model.user_embedding.embeddings.value,
+            model.user_bias.embeddings.value,
+            model.book_embedding.embeddings.value,
+            model.book_bias.embeddings.value
+        ]
+        self.accumulators = [
+            tf.Variable(tf.fill(table.shape, initial_accumulator), trainable=False)
+            for table in self.tables
+        ]
+        self.train_step = tf.function(self._train_step, jit_compile=True)
 
-# Cari buku yang belum dirating user ini
-all_isbns = set(ratings_clean['isbn'].unique())
-rated_isbns = set(books_rated_by_user['isbn'])
-unrated_isbns = list(all_isbns - rated_isbns)
+    def _train_step(self, x_batch, y_batch):
+        user_idx, book_idx = x_batch[:, 0], x_batch[:, 1]
+        indices = [user_idx, user_idx, book_idx, book_idx]
 
-# Encode ISBN yang belum dirated
-unrated_books_encoded = [isbn_to_isbn_encoded.get(x) for x in unrated_isbns if isbn_to_isbn_encoded.get(x) is not None]
-user_encoder = user_to_user_encoded.get(user_id)
+        # Gather baris yang disentuh batch, lalu hitung gradien terhadap baris tersebut saja
+        rows = [tf.gather(table, idx) for table, idx in zip(self.tables, indices)]
+        with tf.GradientTape() as tape:
+            tape.watch(rows)
+            predictions = score_user_book(*rows)
+            loss = tf.reduce_mean(tf.keras.losses.binary_crossentropy(y_batch[:, None], predictions))
+            # Regularisasi L2 hanya untuk baris embedding yang dipakai di batch
+            loss += self.l2 * (tf.reduce_sum(tf.square(rows[0])) + tf.reduce_sum(tf.square(rows[2])))
+        gradients = tape.gradient(loss, rows)
 
-# Bentuk array prediksi
-user_book_array = np.hstack(
-    (np.array([[user_encoder]] * len(unrated_books_encoded)), np.array(unrated_books_encoded).reshape(-1, 1))
-)
+        # Update Adagrad sparse: scatter ke akumulator dan tabel, baris lain tidak disentuh
+        for table, accumulator, idx, grad in zip(self.tables, self.accumulators, indices, gradients):
+            accumulator.scatter_add(tf.IndexedSlices(tf.square(grad), idx))
+            step = self.learning_rate * grad * tf.math.rsqrt(tf.gather(accumulator, idx))
+            table.scatter_sub(tf.IndexedSlices(step, idx))
 
-# Prediksi rating untuk semua buku yang belum dirated
-predicted_ratings = model.predict(user_book_array).flatten()
+        squared_error = tf.reduce_sum(tf.square(y_batch[:, None] - predictions))
+        return loss, squared_error
 
-# Ambil Top-N rekomendasi
-top_n = 5
-top_ratings_indices = predicted_ratings.argsort()[-top_n:][::-1]
-recommended_isbns = [isbn_encoded_to_isbn.get(unrated_books_encoded[i]) for i in top_ratings_indices]
+    def fit(self, dataset, epochs=1, num_examples=None):
+        history = {'loss': [], 'root_mean_squared_error': [], 'examples_per_sec': []}
+        for epoch in range(epochs):
+            start = time.perf_counter()
+            losses, squared_errors, seen = [], [], 0
+            for x_batch, y_batch in dataset:
+                loss, squared_error = self.train_step(x_batch, y_batch)
+                losses.append(loss)
+                squared_errors.append(squared_error)
+                seen += len(y_batch)
+            elapsed = time.perf_counter() - start
 
-# Tampilkan rekomendasi
-print('Top-N Rekomendasi Buku untuk User:')
-recommended_books = books[books['ISBN'].isin(recommended_isbns)][['ISBN', 'Book-Title', 'Book-Author']]
-print(recommended_books)
+            history['loss'].append(float(np.mean(losses)))
+            history['root_mean_squared_error'].append(float(np.sqrt(np.sum(squared_errors) / seen)))
+            history['examples_per_sec'].append((num_examples or seen) / elapsed)
+        return history
 #%% md
-# ### Model-Based Collaborative Filtering (Keras) - Rekomendasi
+# #### Custom Training Loop dengan Update Embedding Sparse
 # 
-# Untuk menguji model Collaborative Filtering berbasis TensorFlow Keras yang telah dilatih, kami melakukan simulasi rekomendasi buku terhadap pengguna acak.
+# Pada tahap ini, kami membuat class `SparseEmbeddingTrainer` sebagai alternatif opsional dari `model.fit`.
 # 
-# **User yang dipilih:** User-ID 263663
+# **Teknik yang digunakan:**
+# - Satu langkah training dikompilasi dengan `tf.function(jit_compile=True)` sehingga gather, forward pass (`score_user_book`), gradien, dan update dijalankan sebagai satu graph XLA.
+# - Gradien dihitung terhadap baris embedding yang di-*gather* saja, bukan terhadap seluruh tabel `user_embedding` dan `book_embedding`.
+# - Update dilakukan dengan Adagrad sparse melalui `scatter_add` (akumulator) dan `scatter_sub` (bobot), sehingga hanya baris user dan buku yang muncul di batch yang berubah.
+# - Regularisasi L2 diterapkan pada baris yang dipakai di batch (lazy regularization).
+# 
+# **Alasan:**
+# - Model ini sangat kecil (dua lookup embedding dan satu dot product), sehingga overhead per langkah dari `model.fit` dan optimizer dense mendominasi waktu training.
+# - Optimizer dense (misalnya Adam) meng-update seluruh tabel embedding di setiap langkah, padahal satu batch hanya menyentuh sebagian kecil user dan buku.
+#%%
+def benchmark_training_loops(x_train, y_train, x_val, y_val, batch_size=1024, epochs=3):
+    # Bandingkan model.fit (Adam) dengan SparseEmbeddingTrainer pada dataset dan batch size yang sama
+    train_dataset = make_dataset(x_train, y_train, batch_size)
+    results = []
+
+    fit_model = RecommenderNet(num_users, num_books, embedding_size=50)
+    fit_model.compile(
+        loss=tf.keras.losses.BinaryCrossentropy(),
+        optimizer=keras.optimizers.Adam(learning_rate=scaled_learning_rate(BASE_LEARNING_RATE, BASE_BATCH_SIZE, batch_size)),
+        metrics=[tf.keras.metrics.RootMeanSquaredError()]
+    )
+    fit_throughput = ThroughputCallback(len(x_train))
+    fit_model.fit(train_dataset, epochs=epochs, callbacks=[fit_throughput], verbose=0)
+    results.append(('model.fit', fit_model, fit_throughput.examples_per_sec))
+
+    custom_model = RecommenderNet(num_users, num_books, embedding_size=50)
+    custom_model(x_train[:1])
+    custom_history = SparseEmbeddingTrainer(custom_model).fit(train_dataset, epochs=epochs, num_examples=len(x_train))
+    results.append(('SparseEmbeddingTrainer', custom_model, custom_history['examples_per_sec']))
+
+    rows = []
+    for name, trained_model, examples_per_sec in results:
+        val_predictions = trained_model.predict(x_val, batch_size=batch_size, verbose=0).ravel()
+        rows.append({
+            'training_loop': name,
+            'first_epoch_examples_per_sec': examples_per_sec[0],
+            'examples_per_sec': np.mean(examples_per_sec[1:]) if epochs > 1 else examples_per_sec[0],
+            'val_rmse': np.sqrt(np.mean((y_val - val_predictions) ** 2))
+        })
+    return pd.DataFrame(rows)
+
+# Epoch pertama memuat waktu tracing/kompilasi, sehingga throughput dihitung dari epoch berikutnya
+benchmark_training_loops(x_train, y_train, x_val, y_val, batch_size=1024, epochs=3)
+#%% md
+# #### Benchmark Custom Training Loop vs model.fit
 # 
-# **Top-5 Buku yang Direkomendasikan:**
+# Pada tahap ini, kami membandingkan `model.fit` (optimizer Adam dense) dengan `SparseEmbeddingTrainer` pada CPU.
 # 
-# | No | Book-Title | Book-Author |
-# |:--|:--|:--|
-# | 1 | The Return of the King (The Lord of the Rings, Part 3) | J.R.R. Tolkien |
-# | 2 | The Two Towers (The Lord of the Rings, Part 2) | J.R.R. Tolkien |
-# | 3 | The Giving Tree | Shel Silverstein |
-# | 4 | Dilbert: A Book of Postcards | Scott Adams |
-# | 5 | Harry Potter and the Chamber of Secrets Postcard Book | J.K. Rowling |
+# **Proses:**
+# - Kedua model dilatih dari inisialisasi baru dengan pipeline `tf.data` dan batch size yang sama selama 3 epoch.
+# - Throughput (examples/detik) epoch pertama dilaporkan terpisah karena memuat waktu tracing dan kompilasi XLA.
+# - RMSE validasi dihitung untuk memastikan percepatan tidak mengorbankan kualitas model.
 # 
-# **Interpretasi Hasil:**
-# - Model mampu merekomendasikan buku populer dan relevan.
-# - Terdapat konsistensi preferensi genre (fantasy, literature classic).
+# **Tujuan:**
+# - Mengukur seberapa besar overhead per langkah yang dihilangkan oleh training step terkompilasi dengan update embedding sparse.
+# - `SparseEmbeddingTrainer` bersifat opsional; model utama tetap dilatih dengan `model.fit` di atas.
+#%%
+class RecommenderNetScorer:
+    # Skoring RecommenderNet dengan NumPy langsung dari bobot embedding dan bias
+    def __init__(self, user_embedding, user_bias, book_embedding, book_bias, num_trained_books=None):
+        self.user_embedding = np.asarray(user_embedding, dtype=np.float32)
+        self.user_bias = np.asarray(user_bias, dtype=np.float32).ravel()
+        self.book_embedding = np.asarray(book_embedding, dtype=np.float32)
+        self.book_bias = np.asarray(book_bias, dtype=np.float32).ravel()
+        # Buku dengan index >= num_trained_books ditambahkan setelah training (embedding nol), tidak direkomendasikan
+        self.num_trained_books = len(self.book_embedding) if num_trained_books is None else int(num_trained_books)
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(
+            model.user_embedding.get_weights()[0],
+            model.user_bias.get_weights()[0],
+            model.book_embedding.get_weights()[0],
+            model.book_bias.get_weights()[0]
+        )
+
+    def score(self, user_indices, book_indices=None):
+        # Skor semua pasangan (user, buku) dalam satu perkalian matriks
+        user_indices = np.atleast_1d(user_indices)
+        if book_indices is None:
+            book_embedding, book_bias = self.book_embedding, self.book_bias
+        else:
+            book_embedding, book_bias = self.book_embedding[book_indices], self.book_bias[book_indices]
+
+        scores = self.user_embedding[user_indices] @ book_embedding.T
+        scores += self.user_bias[user_indices, None]
+        scores += book_bias[None, :]
+
+        # Sigmoid in-place supaya tidak ada alokasi array tambahan
+        np.negative(scores, out=scores)
+        np.exp(scores, out=scores)
+        scores += 1
+        np.reciprocal(scores, out=scores)
+        return scores
+
+    def recommend(self, user_indices, top_n=5, exclude_matrix=None):
+        user_indices = np.atleast_1d(user_indices)
+        scores = self.score(user_indices)
+
+        # Buang buku yang sudah dirating (baris CSR setiap user pada exclude_matrix)
+        if exclude_matrix is not None:
+            rated = exclude_matrix[user_indices]
+            rows = np.repeat(np.arange(len(user_indices)), np.diff(rated.indptr))
+            scores[rows, rated.indices] = -np.inf
+        scores[:, self.num_trained_books:] = -np.inf
+
+        # Top-N per user tanpa sorting penuh, lalu urutkan kandidatnya saja
+        top_n = min(top_n, scores.shape[1])
+        top_books = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+        top_scores = np.take_along_axis(scores, top_books, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top_books, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+# Ambil bobot embedding dari model yang sudah dilatih
+scorer = RecommenderNetScorer.from_model(model)
+
+# Contoh: Top-5 rekomendasi untuk 3 user sekaligus dalam satu perkalian matriks
+example_users = np.arange(min(3, num_users))
+example_books, example_scores = scorer.recommend(example_users, top_n=5, exclude_matrix=user_item_matrix)
+for user_encoded, books_encoded in zip(example_users, example_books):
+    print(user_encoder.decode(user_encoded), isbn_encoder.decode(books_encoded).tolist())
+#%% md
+# #### Skoring RecommenderNet dengan Perkalian Matriks NumPy
+# 
+# Pada tahap ini, kami membuat class `RecommenderNetScorer` untuk menghitung skor rekomendasi tanpa melalui `model.predict`.
+# 
+# **Teknik yang digunakan:**
+# - Bobot `user_embedding`, `user_bias`, `book_embedding`, dan `book_bias` diambil dari `RecommenderNet` sebagai array NumPy.
+# - Skor untuk semua buku (satu atau banyak user sekaligus) dihitung dengan satu perkalian matriks: `sigmoid(U · Bᵀ + bias_user + bias_buku)`, yaitu dot product per pasangan user-buku.
+# - Buku yang sudah dirating user di-mask menggunakan baris CSR `user_item_matrix`, kemudian Top-N dipilih dengan `np.argpartition` per baris.
+# 
+# **Alasan:**
+# - `model.predict` untuk satu user harus melewati seluruh pipeline input Keras dan membutuhkan array pasangan `(user, buku)` sebesar katalog.
+# - Dengan perkalian matriks NumPy, inferensi per user menjadi operasi sub-milidetik, dan beberapa user dapat diproses sekaligus dalam satu batch.
+#%%
+import time
+
+class BookEmbeddingIndex:
+    # Indeks IVF (inverted file) untuk maximum inner product search pada embedding buku
+    def __init__(self, scorer, n_lists=None, n_iter=10, random_state=42):
+        self.scorer = scorer
+
+        # Vektor buku augmented [embedding, bias]; query user = [embedding, 1]
+        book_vectors = np.hstack([scorer.book_embedding, scorer.book_bias[:, None]])
+
+        # Reduksi MIPS ke nearest neighbor: tambahkan satu dimensi agar semua vektor buku memiliki norm yang sama
+        norms = np.linalg.norm(book_vectors, axis=1)
+        max_norm = norms.max() or 1.0
+        extra = np.sqrt(np.maximum(max_norm ** 2 - norms ** 2, 0))
+        self.book_vectors = (np.hstack([book_vectors, extra[:, None]]) / max_norm).astype(np.float32)
+
+        n_books = len(self.book_vectors)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n_books)))
+
+        # Spherical k-means sederhana untuk membagi buku ke dalam n_lists cluster
+        rng = np.random.default_rng(random_state)
+        centroids = self.book_vectors[rng.choice(n_books, self.n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignment = np.argmax(self.book_vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, self.book_vectors)
+            sums_norm = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Cluster kosong tetap memakai centroid lama
+            centroids = np.where(sums_norm > 0, sums / np.maximum(sums_norm, 1e-12), centroids)
+        self.centroids = centroids.astype(np.float32)
+        assignment = np.argmax(self.book_vectors @ self.centroids.T, axis=1)
+
+        # Inverted list dalam format seperti CSR: buku diurutkan berdasarkan cluster
+        self.list_books = np.argsort(assignment, kind='stable').astype(np.int32)
+        self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=self.n_lists))])
+
+    def search(self, user_index, top_n=5, n_probe=8, exclude_matrix=None):
+        # Query augmented user: [embedding, 1, 0]
+        query = np.append(self.scorer.user_embedding[user_index], [1.0, 0.0]).astype(np.float32)
+
+        # Pilih n_probe cluster dengan inner product terbesar, lalu ambil semua buku di dalamnya
+        probe = top_n_indices(self.centroids @ query, n_probe)
+        candidates = np.concatenate([self.list_books[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+
+        # Sama seperti scorer.recommend: buku yang embedding-nya belum dilatih (index >= num_trained_books) tidak direkomendasikan
+        candidates = candidates[candidates < self.scorer.num_trained_books]
+
+        # Buang buku yang sudah dirating user
+        if exclude_matrix is not None:
+            rated = exclude_matrix.indices[exclude_matrix.indptr[user_index]:exclude_matrix.indptr[user_index + 1]]
+            candidates = candidates[~np.isin(candidates, rated)]
+
+        # Skor exact hanya untuk kandidat
+        scores = self.scorer.score(user_index, candidates).ravel()
+        top = top_n_indices(scores, top_n)
+        return candidates[top], scores[top]
+
+def benchmark_ann_index(index, user_indices, top_n=10, n_probe=8, exclude_matrix=None):
+    # Bandingkan hasil ANN dengan hasil exact (scoring semua buku)
+    start = time.perf_counter()
+    exact_books = [index.scorer.recommend(u, top_n, exclude_matrix)[0][0] for u in user_indices]
+    exact_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ann_books = [index.search(u, top_n, n_probe, exclude_matrix)[0] for u in user_indices]
+    ann_time = time.perf_counter() - start
+
+    recall = np.mean([len(np.intersect1d(a, e)) / len(e) for a, e in zip(ann_books, exact_books)])
+    return {
+        'n_probe': n_probe,
+        f'recall@{top_n}': recall,
+        'exact_ms_per_user': exact_time / len(user_indices) * 1000,
+        'ann_ms_per_user': ann_time / len(user_indices) * 1000,
+        'candidate_fraction': n_probe / index.n_lists
+    }
+
+# Membangun indeks IVF dari embedding buku RecommenderNet
+book_index = BookEmbeddingIndex(scorer)
+print('Jumlah cluster (n_lists):', book_index.n_lists)
+
+# Buku dengan index >= num_trained_books juga di-mask pada search, sama dengan scorer.recommend
+partly_trained = RecommenderNetScorer(scorer.user_embedding, scorer.user_bias, scorer.book_embedding, scorer.book_bias, num_books // 2)
+partly_trained_index = BookEmbeddingIndex(partly_trained)
+masked_books, _ = partly_trained_index.search(0, top_n=10, n_probe=partly_trained_index.n_lists)
+assert (masked_books < num_books // 2).all()
+assert set(masked_books) == set(partly_trained.recommend(0, 10)[0][0])
+
+# Benchmark recall ANN terhadap hasil exact untuk beberapa nilai n_probe
+benchmark_users = np.random.default_rng(42).choice(num_users, min(200, num_users), replace=False)
+pd.DataFrame([
+    benchmark_ann_index(book_index, benchmark_users, top_n=10, n_probe=n_probe, exclude_matrix=user_item_matrix)
+    for n_probe in (1, 4, 8, 16)
+])
+#%% md
+# #### Indeks Approximate Nearest Neighbor (IVF) untuk Embedding Buku
+# 
+# Pada tahap ini, kami membangun indeks ANN bergaya **IVF (Inverted File Index)** secara in-process menggunakan NumPy, tanpa service eksternal.
+# 
+# **Teknik yang digunakan:**
+# - **Vektor augmented**: setiap buku direpresentasikan sebagai `[book_embedding, book_bias]` dan user sebagai `[user_embedding, 1]`, sehingga inner product keduanya sama dengan skor model (tanpa `user_bias` yang konstan untuk satu user dan tidak memengaruhi urutan).
+# - **Reduksi MIPS ke nearest neighbor**: vektor buku ditambah satu dimensi `sqrt(M² - ||x||²)` lalu dibagi `M` (norm terbesar), sehingga semua vektor buku memiliki norm 1 dan pencarian inner product terbesar dapat dilakukan dengan clustering berbasis cosine.
+# - **Spherical k-means**: buku dibagi ke dalam `n_lists ≈ √N` cluster. Buku dalam setiap cluster disimpan sebagai inverted list.
+# - **Pencarian**: untuk setiap user, hanya `n_probe` cluster dengan centroid paling relevan yang diperiksa. Skor exact dihitung hanya untuk kandidat di cluster tersebut, sehingga biaya pencarian sebanding dengan `n_probe / n_lists` dari katalog (sublinear).
+# - Seperti `scorer.recommend`, kandidat dengan index >= `num_trained_books` (buku hasil fold-in yang embedding-nya belum dilatih) dibuang sebelum skoring.
+# 
+# **Benchmark:**
+# - Fungsi `benchmark_ann_index` membandingkan hasil ANN dengan hasil exact (`scorer.recommend`) dan menghitung **recall@10** serta waktu per user.
+# - Semakin besar `n_probe`, recall semakin mendekati 1 tetapi jumlah kandidat yang dihitung juga bertambah. Nilai `n_probe` dipilih sesuai target recall dan latensi.
+#%%
+class CandidateGenerator:
+    # Kandidat buku (encoded) = buku yang belum dirating, diambil dari baris CSR user_item_matrix
+    def __init__(self, user_item_matrix, max_batch_size=256):
+        self.user_item_matrix = user_item_matrix.tocsr()
+        # Buffer mask boolean (True = kandidat) yang dipakai ulang antar pemanggilan
+        self._mask = np.ones((max_batch_size, self.user_item_matrix.shape[1]), dtype=bool)
+        self._cleared = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int32))
+
+    def update(self, user_item_matrix):
+        # Dipanggil setelah User-Item Matrix berubah (misalnya setelah fold-in)
+        self.user_item_matrix = user_item_matrix.tocsr()
+        if self._mask.shape[1] != self.user_item_matrix.shape[1]:
+            self._mask = np.ones((len(self._mask), self.user_item_matrix.shape[1]), dtype=bool)
+            self._cleared = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int32))
+
+    def mask(self, user_indices):
+        # Mask (batch, num_books) untuk sekumpulan user. Hasilnya view dari buffer,
+        # sehingga hanya valid sampai pemanggilan mask() berikutnya
+        user_indices = np.atleast_1d(user_indices)
+        if len(user_indices) > len(self._mask):
+            self._mask = np.ones((len(user_indices), self._mask.shape[1]), dtype=bool)
+        else:
+            # Reset hanya entri yang di-set False pada pemanggilan sebelumnya (O(nnz), bukan O(batch x buku))
+            self._mask[self._cleared] = True
+
+        rated = self.user_item_matrix[user_indices]
+        rows = np.repeat(np.arange(len(user_indices)), np.diff(rated.indptr))
+        self._mask[rows, rated.indices] = False
+        self._cleared = (rows, rated.indices)
+        return self._mask[:len(user_indices)]
+
+    def candidates(self, user_index):
+        # Index buku (encoded) yang belum dirating oleh satu user
+        return np.flatnonzero(self.mask(user_index)[0])
+
+candidate_generator = CandidateGenerator(user_item_matrix)
+
+# Sanity check: kandidat + buku yang sudah dirating = seluruh katalog, dan mask batch
+# menghasilkan Top-N yang sama dengan scorer.recommend(exclude_matrix=...)
+check_users = np.arange(min(64, num_users))
+for user in check_users[:5]:
+    rated = user_item_matrix[user].indices
+    assert np.array_equal(np.union1d(candidate_generator.candidates(user), rated), np.arange(num_books))
+    assert not np.isin(rated, candidate_generator.candidates(user)).any()
+
+batch_scores = scorer.score(check_users)
+batch_scores[~candidate_generator.mask(check_users)] = -np.inf
+expected_books, _ = scorer.recommend(check_users, top_n=5, exclude_matrix=user_item_matrix)
+assert np.array_equal(np.sort(np.argsort(-batch_scores, axis=1, kind='stable')[:, :5], axis=1), np.sort(expected_books, axis=1))
+print('Candidate generator konsisten dengan User-Item Matrix')
+#%% md
+# #### Candidate Generator Berbasis Mask CSR
+# 
+# Pada tahap ini, kami membuat class `CandidateGenerator` untuk menentukan buku kandidat (buku yang belum dirating) bagi setiap user.
+# 
+# **Teknik yang digunakan:**
+# - Kandidat ditentukan langsung pada index buku hasil encoding, menggunakan baris CSR `user_item_matrix` (`indptr` dan `indices`) sebagai daftar buku yang sudah dirating.
+# - Mask boolean berukuran `(batch, num_books)` dialokasikan sekali lalu dipakai ulang. Pada setiap pemanggilan, hanya entri yang sebelumnya di-set `False` yang dikembalikan menjadi `True`, sehingga biaya reset sebanding dengan jumlah rating user, bukan ukuran katalog.
+# 
+# **Proses:**
+# - `mask(user_indices)` menghasilkan mask untuk satu batch user sekaligus, yang dapat langsung dipakai pada matriks skor `scorer.score(user_indices)`.
+# - `candidates(user_index)` mengembalikan index buku kandidat untuk satu user dengan `np.flatnonzero`.
+# - `update(user_item_matrix)` dipanggil jika User-Item Matrix berubah (misalnya setelah update inkremental).
+# 
+# **Alasan:**
+# - Sebelumnya, kandidat dihitung dengan `set` dari seluruh ISBN pada `ratings_clean`, dikurangi `set` ISBN yang sudah dirating, lalu di-encode satu per satu dengan list comprehension setiap kali satu user diproses.
+# - Dengan mask dari baris CSR, tidak ada lagi loop Python per buku maupun filtering `ratings_clean` pada jalur serving.
+#%%
+# Ambil 1 contoh user random
+user_id = ratings_clean['user_id'].sample(1).iloc[0]
+print(f"Testing rekomendasi untuk User ID: {user_id}")
+user_encoded = user_encoder.encode([user_id])[0]
+
+# Buku kandidat = buku yang belum dirating user ini (index encoded dari mask CSR)
+unrated_books_encoded = candidate_generator.candidates(user_encoded)
+
+# Prediksi rating untuk semua buku yang belum dirated (tanpa model.predict)
+predicted_ratings = scorer.score(user_encoded, unrated_books_encoded).ravel()
+
+# Ambil Top-N rekomendasi
+top_n = 5
+top_ratings_indices = top_n_indices(predicted_ratings, top_n)
+recommended_books_encoded = unrated_books_encoded[top_ratings_indices]
+
+# Kembalikan output sigmoid ke skala rating asli (1-10)
+predicted_top_ratings = rating_scaler.inverse_transform(predicted_ratings[top_ratings_indices])
+
+# Tampilkan rekomendasi (metadata diambil langsung dengan index encoded buku)
+print('Top-N Rekomendasi Buku untuk User:')
+recommended_books = book_metadata.iloc[recommended_books_encoded].copy()
+recommended_books['Predicted-Rating'] = predicted_top_ratings
+print(recommended_books)
+#%% md
+# ### Model-Based Collaborative Filtering (Keras) - Rekomendasi
+# 
+# Untuk menguji model Collaborative Filtering berbasis TensorFlow Keras yang telah dilatih, kami melakukan simulasi rekomendasi buku terhadap pengguna acak.
+# 
+# **User yang dipilih:** User-ID 263663
+# 
+# **Top-5 Buku yang Direkomendasikan:**
+# 
+# | No | Book-Title | Book-Author |
+# |:--|:--|:--|
+# | 1 | The Return of the King (The Lord of the Rings, Part 3) | J.R.R. Tolkien |
+# | 2 | The Two Towers (The Lord of the Rings, Part 2) | J.R.R. Tolkien |
+# | 3 | The Giving Tree | Shel Silverstein |
+# | 4 | Dilbert: A Book of Postcards | Scott Adams |
+# | 5 | Harry Potter and the Chamber of Secrets Postcard Book | J.K. Rowling |
+# 
+# **Interpretasi Hasil:**
+# - Model mampu merekomendasikan buku populer dan relevan.
+# - Terdapat konsistensi preferensi genre (fantasy, literature classic).
 # - Ini menunjukkan bahwa embedding model berhasil menangkap representasi laten dari interaksi user-buku.
 # 
 #%% md
+# ## Model Development dengan Alternating Least Squares (ALS)
+#%%
+from concurrent.futures import ThreadPoolExecutor
+from scipy.sparse import csr_matrix
+
+class ALSRecommender:
+    # Matrix factorization dengan Alternating Least Squares, hanya NumPy/SciPy (tanpa TensorFlow)
+    def __init__(self, embedding_size=50, regularization=0.1, n_iter=10, implicit=False, alpha=40.0,
+                 cg_steps=None, block_size=1024, max_block_entries=2 ** 18, n_jobs=None, random_state=42):
+        self.embedding_size = embedding_size
+        self.regularization = regularization
+        self.n_iter = n_iter
+        self.implicit = implicit
+        self.alpha = alpha
+        self.cg_steps = cg_steps
+        self.block_size = block_size
+        self.max_block_entries = max_block_entries
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, ratings_matrix):
+        # ratings_matrix: CSR (num_users x num_books); explicit = target per rating, implicit = kekuatan interaksi
+        ratings_matrix = csr_matrix(ratings_matrix, dtype=np.float32)
+        ratings_matrix_t = ratings_matrix.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        num_users, num_books = ratings_matrix.shape
+        self.user_embedding = rng.normal(0, 0.1, (num_users, self.embedding_size)).astype(np.float32)
+        self.book_embedding = rng.normal(0, 0.1, (num_books, self.embedding_size)).astype(np.float32)
+
+        user_blocks = self._row_blocks(ratings_matrix)
+        book_blocks = self._row_blocks(ratings_matrix_t)
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as executor:
+            for _ in range(self.n_iter):
+                self._solve(executor, ratings_matrix, user_blocks, self.book_embedding, self.user_embedding)
+                self._solve(executor, ratings_matrix_t, book_blocks, self.user_embedding, self.book_embedding)
+        return self
+
+    def _row_blocks(self, matrix):
+        # Baris diurutkan dari yang paling banyak rating, lalu dipotong per blok
+        # sehingga (jumlah baris x panjang baris terpanjang) tidak melebihi max_block_entries
+        lengths = np.diff(matrix.indptr)
+        rows = np.argsort(-lengths, kind='stable')
+        rows = rows[lengths[rows] > 0]
+
+        blocks, start = [], 0
+        while start < len(rows):
+            max_length = lengths[rows[start]]
+            size = int(np.clip(self.max_block_entries // max_length, 1, self.block_size))
+            blocks.append(rows[start:start + size])
+            start += size
+        return blocks
+
+    def _solve(self, executor, matrix, blocks, fixed, target):
+        # Selesaikan least squares untuk setiap baris target dengan faktor 'fixed' dibekukan
+        gram = fixed.T @ fixed if self.implicit else None
+        list(executor.map(lambda block: self._solve_block(matrix, block, fixed, target, gram), blocks))
+
+    def _solve_block(self, matrix, rows, fixed, target, gram):
+        starts, ends = matrix.indptr[rows], matrix.indptr[rows + 1]
+        lengths = ends - starts
+
+        # Padding per baris ke panjang terpanjang di blok; entri padding diberi bobot 0
+        positions = starts[:, None] + np.arange(lengths.max())
+        mask = positions < ends[:, None]
+        positions = np.where(mask, positions, 0)
+        factors = fixed[matrix.indices[positions]]
+        values = np.where(mask, matrix.data[positions], 0)
+
+        if self.implicit:
+            # Hu-Koren-Volinsky: confidence c = 1 + alpha * r, preference p = 1
+            weights = self.alpha * values
+            regularization = np.full(len(rows), self.regularization, dtype=np.float32)
+            b = np.einsum('rl,rlk->rk', (1 + weights) * mask, factors)
+        else:
+            # Explicit: regularisasi diberi bobot jumlah rating per baris (weighted-lambda)
+            weights = mask.astype(np.float32)
+            regularization = (self.regularization * lengths).astype(np.float32)
+            b = np.einsum('rl,rlk->rk', values, factors)
+
+        if self.cg_steps is None:
+            # A = gram + Fᵀ diag(w) F + λI, diselesaikan langsung untuk seluruh blok
+            A = np.matmul(factors.transpose(0, 2, 1), factors * weights[:, :, None])
+            if gram is not None:
+                A += gram
+            A += regularization[:, None, None] * np.eye(self.embedding_size, dtype=np.float32)
+            target[rows] = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+        else:
+            target[rows] = self._conjugate_gradient(factors, weights, regularization, gram, b, target[rows])
+
+    def _conjugate_gradient(self, factors, weights, regularization, gram, b, x):
+        # Conjugate gradient batched tanpa membentuk matriks A, warm start dari solusi iterasi sebelumnya
+        def matvec(v):
+            Av = np.matmul((weights * np.matmul(factors, v[:, :, None])[:, :, 0])[:, None, :], factors)[:, 0, :]
+            Av += regularization[:, None] * v
+            if gram is not None:
+                Av += v @ gram
+            return Av
+
+        r = b - matvec(x)
+        p = r.copy()
+        rs = np.sum(r * r, axis=1)
+        for _ in range(self.cg_steps):
+            Ap = matvec(p)
+            step = rs / np.maximum(np.sum(p * Ap, axis=1), 1e-12)
+            x += step[:, None] * p
+            r -= step[:, None] * Ap
+            rs_new = np.sum(r * r, axis=1)
+            p = r + (rs_new / np.maximum(rs, 1e-12))[:, None] * p
+            rs = rs_new
+        return x
+
+    def to_scorer(self):
+        # Embedding berbentuk sama dengan RecommenderNet, bias diisi nol
+        return RecommenderNetScorer(
+            self.user_embedding,
+            np.zeros(len(self.user_embedding), dtype=np.float32),
+            self.book_embedding,
+            np.zeros(len(self.book_embedding), dtype=np.float32)
+        )
+#%% md
+# #### Membangun Class ALSRecommender
+# 
+# Pada tahap ini, kami membuat class `ALSRecommender` sebagai alternatif `RecommenderNet` yang tidak membutuhkan TensorFlow.
+# 
+# **Teknik yang digunakan:**
+# - **Alternating Least Squares**: embedding buku dibekukan lalu embedding setiap user diselesaikan sebagai least squares tertutup, kemudian sebaliknya, diulang sebanyak `n_iter`.
+# - **Mode explicit**: meminimalkan error kuadrat pada rating yang ada dengan regularisasi *weighted-λ* (λ dikali jumlah rating user/buku).
+# - **Mode implicit (Hu-Koren-Volinsky)**: setiap interaksi dianggap preferensi 1 dengan confidence `1 + alpha * rating`, dan buku yang tidak diinteraksi dianggap preferensi 0 melalui Gram matrix `YᵀY` yang dihitung sekali per iterasi.
+# - **Conjugate gradient (opsional)**: dengan `cg_steps`, sistem linear diselesaikan dengan beberapa langkah conjugate gradient batched yang di-*warm start* dari solusi iterasi sebelumnya. Matriks `A` tidak pernah dibentuk; perkalian `A · p` dihitung langsung dari embedding yang dirating, sehingga biaya per baris sebanding dengan jumlah rating dan tidak lagi kubik terhadap `embedding_size`.
+# - **Blok dan thread pool**: baris diurutkan berdasarkan jumlah rating lalu dibagi per blok, sehingga setiap blok diselesaikan dengan satu `np.matmul` dan satu `np.linalg.solve` batched. Blok-blok diproses paralel dengan `ThreadPoolExecutor` (operasi NumPy tersebut melepas GIL).
+# - `to_scorer` menghasilkan `RecommenderNetScorer` dengan embedding berbentuk sama seperti `RecommenderNet` (`num_users x embedding_size` dan `num_books x embedding_size`) dan bias nol, sehingga fungsi rekomendasi dan indeks ANN dapat dipakai ulang.
+# 
+# **Alasan:**
+# - Setiap langkah ALS adalah solusi tertutup, sehingga konvergen dalam beberapa iterasi tanpa learning rate maupun epoch.
+# - Class ini hanya membutuhkan NumPy dan SciPy, sehingga deployment yang ringan tidak perlu mengimpor TensorFlow.
+#%%
+# Target explicit ALS berupa logit rating ternormalisasi, sehingga sigmoid(u · b) berada pada skala yang sama dengan output RecommenderNet
+train_targets = np.clip(y_train, 0.05, 0.95)
+train_logits = np.log(train_targets / (1 - train_targets)).astype(np.float32)
+train_matrix = csr_matrix((train_logits, (x_train[:, 0], x_train[:, 1])), shape=(num_users, num_books))
+
+start = time.perf_counter()
+als = ALSRecommender(embedding_size=50, regularization=0.1, n_iter=10, cg_steps=3).fit(train_matrix)
+als_seconds = time.perf_counter() - start
+
+als_scorer = als.to_scorer()
+als_val_predictions = 1 / (1 + np.exp(-np.sum(als.user_embedding[x_val[:, 0]] * als.book_embedding[x_val[:, 1]], axis=1)))
+als_val_rmse = np.sqrt(np.mean((y_val - als_val_predictions) ** 2))
+
+# Waktu training model.fit dihitung ulang dari throughput yang dicatat ThroughputCallback
+fit_seconds = np.sum(len(x_train) / np.array(throughput.examples_per_sec))
+print(f"ALS explicit: {als_seconds:.2f} detik, RMSE validasi: {als_val_rmse:.4f}")
+print(f"RecommenderNet (model.fit): {fit_seconds:.2f} detik, RMSE validasi: {min(history.history['val_root_mean_squared_error']):.4f}")
+
+# Mode implicit: confidence dihitung dari rating asli
+train_ratings = ratings_clean['book_rating'].values[:train_indices].astype(np.float32)
+implicit_matrix = csr_matrix((train_ratings, (x_train[:, 0], x_train[:, 1])), shape=(num_users, num_books))
+als_implicit = ALSRecommender(embedding_size=50, regularization=0.1, n_iter=10, implicit=True, alpha=40.0, cg_steps=3).fit(implicit_matrix)
+
+example_books, example_scores = als_implicit.to_scorer().recommend(example_users, top_n=5, exclude_matrix=user_item_matrix)
+for user_encoded, books_encoded in zip(example_users, example_books):
+    print(user_encoder.decode(user_encoded), isbn_encoder.decode(books_encoded).tolist())
+#%% md
+# #### Training ALS Explicit dan Implicit
+# 
+# Pada tahap ini, kami melatih `ALSRecommender` pada data training yang sama dengan `RecommenderNet`.
+# 
+# **Proses:**
+# - **Explicit**: target berupa logit dari rating ternormalisasi (dipotong ke rentang [0.05, 0.95]), sehingga `sigmoid(u · b)` langsung sebanding dengan output sigmoid `RecommenderNet` dan RMSE validasi dapat dibandingkan.
+# - Sistem linear diselesaikan dengan 3 langkah conjugate gradient per iterasi (`cg_steps=3`).
+# - Waktu training ALS dibandingkan dengan total waktu `model.fit` yang dihitung dari `ThroughputCallback`.
+# - **Implicit**: setiap rating dianggap interaksi dengan confidence `1 + 40 * rating`, lalu Top-5 rekomendasi dihasilkan melalui `to_scorer().recommend`.
+# 
+# **Tujuan:**
+# - Menyediakan engine latent factor yang dilatih dalam beberapa detik di CPU tanpa TensorFlow.
+# - Embedding ALS dapat langsung dipakai oleh `RecommenderNetScorer` dan `BookEmbeddingIndex`.
+#%% md
+# ## Training Paralel Multi-Proses untuk Matrix Factorization SGD
+#%%
+import os
+from multiprocessing import shared_memory
+
+# Executor loky (bawaan joblib, dependency scikit-learn): worker adalah proses Python baru (bukan fork dari
+# proses yang sudah menjalankan thread TensorFlow), dan fungsi yang didefinisikan di notebook tetap bisa dikirim
+from joblib.externals.loky import get_reusable_executor
+
+def _attach_tables(specs):
+    # Buka tabel shared memory berdasarkan nama dari proses utama (block tetap dimiliki dan di-unlink oleh proses utama)
+    blocks = [shared_memory.SharedMemory(name=name) for name, _, _ in specs]
+    tables = [np.ndarray(shape, dtype=dtype, buffer=block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+    return blocks, tables
+
+def _sgd_worker(tables, start_tables, x_shard, y_shard, config, seed):
+    # Satu worker: SGD pada shard rating-nya sendiri, tabel embedding berada di shared memory
+    user_embedding, user_bias, book_embedding, book_bias = tables
+    if config['mode'] == 'average':
+        # Parameter averaging: semua shard mulai dari snapshot awal epoch yang sama (start_tables),
+        # lalu delta rata-ratanya dikembalikan dan dijumlahkan oleh proses utama
+        user_embedding, user_bias, book_embedding, book_bias = local_tables = [table.copy() for table in start_tables]
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(x_shard))
+    learning_rate, l2, batch_size = config['learning_rate'], config['l2'], config['batch_size']
+    squared_error = 0.0
+
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        users, books, y = x_shard[batch, 0], x_shard[batch, 1], y_shard[batch]
+        u, b = user_embedding[users], book_embedding[books]
+
+        prediction = 1 / (1 + np.exp(-(np.sum(u * b, axis=1) + user_bias[users] + book_bias[books])))
+        error = prediction - y
+        squared_error += float(np.sum(error ** 2))
+
+        # Gradien binary crossentropy terhadap logit = prediction - y
+        np.subtract.at(user_embedding, users, learning_rate * (error[:, None] * b + l2 * u))
+        np.subtract.at(book_embedding, books, learning_rate * (error[:, None] * u + l2 * b))
+        np.subtract.at(user_bias, users, learning_rate * error)
+        np.subtract.at(book_bias, books, learning_rate * error)
+
+    if config['mode'] == 'average':
+        deltas = [(local_table - start_table) / config['n_shards'] for start_table, local_table in zip(start_tables, local_tables)]
+        return squared_error, deltas
+    return squared_error, None
+
+def _sgd_process(table_specs, start_specs, x_shard, y_shard, config, seed):
+    # Dijalankan di proses worker: tabel bersama dan snapshot dibuka dari shared memory berdasarkan namanya
+    blocks, tables = _attach_tables(table_specs)
+    start_blocks, start_tables = _attach_tables(start_specs) if start_specs else ([], None)
+    try:
+        return _sgd_worker(tables, start_tables, x_shard, y_shard, config, seed)
+    finally:
+        del tables, start_tables
+        for block in blocks + start_blocks:
+            block.close()
+
+
+class ParallelSGDTrainer:
+    # Matrix factorization (skor sama dengan RecommenderNet) yang dilatih dengan SGD di banyak proses
+    def __init__(self, num_users, num_books, embedding_size=50, mode='hogwild', n_workers=None,
+                 learning_rate=0.05, l2=1e-6, batch_size=256, deterministic=False, random_state=42):
+        if mode not in ('hogwild', 'average'):
+            raise ValueError(f"Mode tidak dikenal: {mode}")
+        self.shapes = [(num_users, embedding_size), (num_users,), (num_books, embedding_size), (num_books,)]
+        self.mode = mode
+        self.n_workers = n_workers or os.cpu_count()
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.batch_size = batch_size
+        self.deterministic = deterministic
+        self.random_state = random_state
+
+        # Inisialisasi seperti RecommenderNet: he_normal untuk embedding, nol untuk bias
+        rng = np.random.default_rng(random_state)
+        std = np.sqrt(2 / embedding_size)
+        self.tables = [
+            rng.normal(0, std, self.shapes[0]).astype(np.float32),
+            np.zeros(num_users, dtype=np.float32),
+            rng.normal(0, std, self.shapes[2]).astype(np.float32),
+            np.zeros(num_books, dtype=np.float32)
+        ]
+
+    def fit(self, x_train, y_train, epochs=5):
+        x_train = np.asarray(x_train)
+        y_train = np.asarray(y_train, dtype=np.float32)
+        shards = np.array_split(np.arange(len(x_train)), self.n_workers)
+        config = {
+            'mode': self.mode, 'learning_rate': self.learning_rate, 'l2': self.l2,
+            'batch_size': self.batch_size, 'n_shards': len(shards)
+        }
+        history = {'root_mean_squared_error': [], 'examples_per_sec': []}
+
+        # Tabel embedding (dan snapshot awal epoch untuk mode average) dipindah ke shared memory, sehingga
+        # worker cukup menerima nama block-nya dan meng-update tabel yang sama tanpa menyalin data
+        n_copies = 2 if self.mode == 'average' else 1
+        blocks = [shared_memory.SharedMemory(create=True, size=table.nbytes) for _ in range(n_copies) for table in self.tables]
+        specs = [(block.name, table.shape, table.dtype.str) for block, table in zip(blocks, self.tables * n_copies)]
+        all_tables = [np.ndarray(shape, dtype=dtype, buffer=block.buf) for block, (_, shape, dtype) in zip(blocks, specs)]
+        shared_tables, start_tables = all_tables[:4], all_tables[4:] or None
+        table_specs, start_specs = specs[:4], specs[4:] or None
+        executor = None
+        try:
+            for shared_table, table in zip(shared_tables, self.tables):
+                shared_table[:] = table
+            if not self.deterministic:
+                executor = get_reusable_executor(max_workers=len(shards), reuse=False)
+
+            for epoch in range(epochs):
+                start = time.perf_counter()
+                seeds = [self.random_state + epoch * len(shards) + worker_id for worker_id in range(len(shards))]
+                # Snapshot tabel di awal epoch, dipakai semua shard pada mode average (berurutan maupun paralel)
+                if start_tables is not None:
+                    for start_table, shared_table in zip(start_tables, shared_tables):
+                        start_table[:] = shared_table
+                if self.deterministic:
+                    # Shard diproses berurutan di proses utama dengan seed tetap, hasilnya identik di setiap run
+                    results = [
+                        _sgd_worker(shared_tables, start_tables, x_train[shard], y_train[shard], config, seeds[worker_id])
+                        for worker_id, shard in enumerate(shards)
+                    ]
+                else:
+                    futures = [
+                        executor.submit(_sgd_process, table_specs, start_specs, x_train[shard], y_train[shard], config, seeds[worker_id])
+                        for worker_id, shard in enumerate(shards)
+                    ]
+                    results = [future.result() for future in futures]
+
+                # Delta mode average dijumlahkan berurutan per shard, sama untuk versi berurutan maupun paralel
+                for _, deltas in results:
+                    if deltas is not None:
+                        for shared_table, delta in zip(shared_tables, deltas):
+                            shared_table += delta
+
+                elapsed = time.perf_counter() - start
+                squared_error = sum(result[0] for result in results)
+                history['root_mean_squared_error'].append(float(np.sqrt(squared_error / len(x_train))))
+                history['examples_per_sec'].append(len(x_train) / elapsed)
+
+            self.tables = [shared_table.copy() for shared_table in shared_tables]
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+            del shared_tables, start_tables, all_tables
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return history
+
+    def to_scorer(self):
+        return RecommenderNetScorer(*self.tables)
+#%% md
+# #### Membangun Trainer SGD Multi-Proses dengan Shared Memory
+# 
+# Pada tahap ini, kami membuat class `ParallelSGDTrainer` untuk melatih matrix factorization dengan skor yang sama seperti `RecommenderNet`, yaitu `sigmoid(u · b + bias_user + bias_buku)` dengan loss binary crossentropy, menggunakan banyak proses sekaligus.
+# 
+# **Teknik yang digunakan:**
+# - Tabel `user_embedding`, `user_bias`, `book_embedding`, dan `book_bias` disalin ke `multiprocessing.shared_memory`, sehingga semua worker membaca dan menulis tabel yang sama tanpa menyalin data.
+# - `x_train`/`y_train` dibagi menjadi `n_workers` shard, dan setiap worker menjalankan SGD mini-batch pada shard-nya sendiri. Worker dijalankan dengan executor `loky` (bawaan `joblib`): setiap worker adalah proses Python baru, bukan `fork` dari proses notebook yang sudah menjalankan thread pool TensorFlow (fork dari proses multithread dapat membuat worker deadlock). Worker hanya menerima nama block shared memory, lalu membuka tabelnya sendiri.
+# - **Mode `hogwild`**: setiap worker meng-update tabel bersama secara langsung tanpa lock. Karena satu batch hanya menyentuh sebagian kecil baris, tabrakan update jarang terjadi.
+# - **Mode `average`** (parameter averaging): di awal setiap epoch tabel disalin sekali ke snapshot di shared memory. Setiap worker melatih salinan lokal dari snapshot yang sama selama satu epoch, lalu mengembalikan `delta / n_shard` (terhadap snapshot). Proses utama menjumlahkan delta tersebut ke tabel bersama sesuai urutan shard, sehingga tidak perlu lock.
+# - **Mode `deterministic`**: shard diproses berurutan di proses utama dengan seed tetap per shard dan per epoch, sehingga hasilnya identik di setiap run (untuk pengujian). Pada mode `average`, shard tetap mulai dari snapshot awal epoch dan delta dijumlahkan dengan urutan yang sama, sehingga hasilnya identik dengan versi paralel.
+# 
+# **Alasan:**
+# - Training `RecommenderNet` hanya memakai satu proses, sedangkan server training memiliki 32 core.
+# - Dengan shared memory, menambah worker tidak menambah salinan tabel embedding (kecuali salinan lokal pada mode `average`).
+#%%
+# Deterministic mode: dua run dengan konfigurasi yang sama harus menghasilkan bobot yang identik
+deterministic_runs = [
+    ParallelSGDTrainer(num_users, num_books, n_workers=4, mode=mode, deterministic=True)
+    for mode in ('hogwild', 'hogwild', 'average', 'average')
+]
+for trainer in deterministic_runs:
+    trainer.fit(x_train, y_train, epochs=1)
+for first, second in (deterministic_runs[:2], deterministic_runs[2:]):
+    assert all(np.array_equal(a, b) for a, b in zip(first.tables, second.tables))
+
+# Parameter averaging berurutan dan paralel menjalankan algoritma yang sama dengan urutan penjumlahan delta yang sama
+parallel_average = ParallelSGDTrainer(num_users, num_books, n_workers=4, mode='average')
+parallel_average.fit(x_train, y_train, epochs=1)
+assert all(np.array_equal(a, b) for a, b in zip(deterministic_runs[2].tables, parallel_average.tables))
+print('Deterministic mode menghasilkan bobot yang identik')
+
+# Training paralel dengan semua core
+parallel_trainer = ParallelSGDTrainer(num_users, num_books, mode='hogwild')
+parallel_history = parallel_trainer.fit(x_train, y_train, epochs=5)
+
+parallel_scorer = parallel_trainer.to_scorer()
+parallel_val_predictions = 1 / (1 + np.exp(-(
+    np.sum(parallel_scorer.user_embedding[x_val[:, 0]] * parallel_scorer.book_embedding[x_val[:, 1]], axis=1)
+    + parallel_scorer.user_bias[x_val[:, 0]] + parallel_scorer.book_bias[x_val[:, 1]]
+)))
+print(f"Jumlah worker: {parallel_trainer.n_workers}")
+print(f"Throughput: {np.mean(parallel_history['examples_per_sec']):,.0f} examples/detik")
+print(f"RMSE validasi: {np.sqrt(np.mean((y_val - parallel_val_predictions) ** 2)):.4f}")
+#%% md
+# #### Training SGD Paralel dan Uji Determinisme
+# 
+# **Proses:**
+# - Menjalankan `ParallelSGDTrainer` dua kali dengan `deterministic=True` untuk setiap mode dan memastikan bobot yang dihasilkan identik.
+# - Memastikan mode `average` yang berurutan (deterministic) menghasilkan bobot yang identik dengan versi paralel 4 worker.
+# - Melatih model dengan mode `hogwild` menggunakan semua core (`os.cpu_count()`) selama 5 epoch.
+# - Melaporkan throughput (examples/detik) dan RMSE validasi pada skala yang sama dengan `RecommenderNet`.
+# 
+# **Hasil:**
+# - Bobot hasil training dapat dipakai langsung melalui `to_scorer()` untuk rekomendasi maupun indeks ANN.
+# - Throughput bertambah seiring jumlah core karena setiap worker memproses shard-nya secara paralel.
+#%% md
+# ## Update Inkremental (Fold-In) untuk User dan Rating Baru
+#%%
+from scipy.sparse import csr_matrix
+
+class IncrementalUpdater:
+    # Menambahkan user, buku, dan rating baru tanpa retraining penuh
+    def __init__(self, scorer, user_item_matrix, rating_scaler, user_encoder, isbn_encoder, neighbor_index=None,
+                 dense_similarity=None, book_metadata=None, book_catalog=None, regularization=1.0, result_cache=None):
+        self.scorer = scorer
+        self.user_item_matrix = user_item_matrix.tocsr()
+        self.rating_scaler = rating_scaler
+        self.user_encoder = user_encoder
+        self.isbn_encoder = isbn_encoder
+        self.neighbor_index = neighbor_index
+        # Matriks cosine similarity penuh (USER_SIMILARITY_MODE='full'), diperbarui per baris/kolom user yang berubah
+        self.dense_similarity = dense_similarity
+        self.book_metadata = book_metadata
+        self.book_catalog = book_catalog
+        self.regularization = regularization
+        self.result_cache = result_cache
+
+    def _grow_tables(self, num_users, num_books):
+        # Tabel embedding diperbesar; baris baru diisi nol sampai di-fold-in
+        scorer = self.scorer
+        extra_users = num_users - len(scorer.user_embedding)
+        extra_books = num_books - len(scorer.book_embedding)
+        if extra_users > 0:
+            scorer.user_embedding = np.vstack([scorer.user_embedding, np.zeros((extra_users, scorer.user_embedding.shape[1]), dtype=np.float32)])
+            scorer.user_bias = np.concatenate([scorer.user_bias, np.zeros(extra_users, dtype=np.float32)])
+        if extra_books > 0:
+            scorer.book_embedding = np.vstack([scorer.book_embedding, np.zeros((extra_books, scorer.book_embedding.shape[1]), dtype=np.float32)])
+            scorer.book_bias = np.concatenate([scorer.book_bias, np.zeros(extra_books, dtype=np.float32)])
+
+    def _grow_book_metadata(self, num_books):
+        if self.book_metadata is None or len(self.book_metadata) >= num_books:
+            return
+        # Baris buku baru disusun sama seperti book_metadata; judul kosong (NaN) jika tidak ada di katalog
+        new_isbns = self.isbn_encoder.decode(np.arange(len(self.book_metadata), num_books))
+        catalog = self.book_catalog if self.book_catalog is not None else self.book_metadata
+        new_rows = (
+            catalog.drop_duplicates('ISBN')
+            .set_index('ISBN')
+            .reindex(new_isbns)[['Book-Title', 'Book-Author']]
+            .rename_axis('ISBN')
+            .reset_index()
+        )
+        self.book_metadata = pd.concat([self.book_metadata, new_rows], ignore_index=True)
+
+    def add_ratings(self, user_ids, isbns, ratings):
+        # 1. Encode ID (ID baru ditambahkan ke encoder)
+        users = self.user_encoder.add(user_ids)
+        books = self.isbn_encoder.add(isbns)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        num_users, num_books = len(self.user_encoder), len(self.isbn_encoder)
+
+        # 2. Susun ulang baris User-Item Matrix milik user yang berubah, lalu sisipkan dengan replace_csr_rows
+        changed_users = np.unique(users)
+        old_matrix = self.user_item_matrix
+        new_rows = self._merged_rows(changed_users, users, books, ratings, num_books)
+        old_books = old_matrix[changed_users[changed_users < old_matrix.shape[0]]].indices
+        touched_books = np.union1d(old_books, new_rows.indices)
+        # User yang similarity-nya berubah: user yang diperbarui dan semua co-rater buku yang tersentuh
+        affected_users = np.union1d(changed_users, self._co_raters(touched_books, old_matrix))
+        self.user_item_matrix = replace_csr_rows(old_matrix, changed_users, new_rows, (num_users, num_books))
+
+        # 3. Perbesar tabel embedding dan metadata buku
+        self._grow_tables(num_users, num_books)
+        self._grow_book_metadata(num_books)
+
+        # 4. Fold-in vektor setiap user yang berubah terhadap embedding buku yang dibekukan
+        for user in changed_users:
+            self.fold_in_user(user)
+
+        # 5. Tambal hanya baris user yang berubah pada indeks tetangga atau matriks similarity penuh
+        if self.neighbor_index is not None:
+            self.neighbor_index.update_rows(self.user_item_matrix, changed_users, affected_users)
+        if self.dense_similarity is not None:
+            self._update_dense_similarity(changed_users)
+
+        # 6. Hapus hasil rekomendasi di cache yang bergantung pada rating yang berubah
+        if self.result_cache is not None:
+            self._invalidate_cache(changed_users, affected_users)
+        return users
+
+    def _merged_rows(self, changed_users, users, books, ratings, num_books):
+        # Baris lama user yang berubah digabung dengan rating baru; rating baru menimpa rating lama
+        # pada pasangan user-buku yang sama, dan rating 0 menghapus entri
+        matrix = self.user_item_matrix
+        old = matrix[changed_users[changed_users < matrix.shape[0]]].tocoo()  # user lama selalu di awal changed_users
+        rows = np.concatenate([old.row, np.searchsorted(changed_users, users)])
+        cols = np.concatenate([old.col, books])
+        values = np.concatenate([old.data, ratings]).astype(matrix.dtype)
+        order = np.lexsort((np.arange(len(rows)), cols, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        last = np.append((rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1]), True)
+        keep = last & (values != 0)
+        return csr_matrix((values[keep], (rows[keep], cols[keep])), shape=(len(changed_users), num_books))
+
+    def _co_raters(self, books, old_matrix):
+        # Semua user yang pernah merating buku tersebut (sebelum update); memakai transpose di indeks tetangga jika ada
+        if self.neighbor_index is not None:
+            normalized_t = self.neighbor_index.user_item_normalized_t
+            return np.unique(normalized_t[books[books < normalized_t.shape[0]]].indices)
+        return np.unique(old_matrix[:, books[books < old_matrix.shape[1]]].nonzero()[0])
+
+    def _update_dense_similarity(self, changed_users):
+        # Similarity dua user hanya berubah jika salah satunya berubah, jadi cukup hitung ulang baris dan kolom
+        # user yang berubah; matriks diperbesar untuk user baru
+        num_users = self.user_item_matrix.shape[0]
+        similarity = self.dense_similarity
+        if similarity.shape[0] < num_users:
+            grown = np.zeros((num_users, num_users), dtype=similarity.dtype)
+            grown[:similarity.shape[0], :similarity.shape[1]] = similarity
+            similarity = grown
+        rows = cosine_similarity(self.user_item_matrix[changed_users], self.user_item_matrix)
+        similarity[changed_users, :] = rows
+        similarity[:, changed_users] = rows.T
+        self.dense_similarity = similarity
+
+    def _invalidate_cache(self, changed_users, affected_users):
+        # Hasil User-Based berubah untuk semua user yang similarity-nya berubah, hasil neural hanya untuk user
+        # yang di-fold-in (buku baru di-mask pada scorer.recommend sampai model dilatih ulang)
+        tags = [('userbased', user) for user in affected_users.tolist()]
+        tags += [('neural', user) for user in changed_users.tolist()]
+        self.result_cache.invalidate(tags)
+
+    def fold_in_user(self, user):
+        # Ridge regression untuk [user_embedding, user_bias] dengan embedding dan bias buku tetap
+        start, end = self.user_item_matrix.indptr[user], self.user_item_matrix.indptr[user + 1]
+        books = self.user_item_matrix.indices[start:end]
+        ratings = self.user_item_matrix.data[start:end]
+        if len(books) == 0:
+            # User tanpa rating: vektor nol dan bias rata-rata user (sistem linear tanpa rating akan singular)
+            self.scorer.user_embedding[user] = 0
+            self.scorer.user_bias[user] = self.scorer.user_bias.mean()
+            return np.append(self.scorer.user_embedding[user], self.scorer.user_bias[user])
+
+        # Target berupa logit rating ternormalisasi, sama dengan skala output sigmoid model
+        targets = np.clip(self.rating_scaler.transform(ratings), 0.05, 0.95)
+        targets = np.log(targets / (1 - targets)) - self.scorer.book_bias[books]
+
+        features = np.hstack([self.scorer.book_embedding[books], np.ones((len(books), 1), dtype=np.float32)])
+        penalty = self.regularization * np.eye(features.shape[1], dtype=np.float32)
+        penalty[-1, -1] = 0  # bias user tidak diregularisasi
+        solution = np.linalg.solve(features.T @ features + penalty, features.T @ targets)
+
+        self.scorer.user_embedding[user] = solution[:-1]
+        self.scorer.user_bias[user] = solution[-1]
+        return solution
+
+
+def grow_recommender_net(model, scorer):
+    # Bangun RecommenderNet baru dengan ukuran tabel terbaru dan salin bobot dari scorer (termasuk user hasil fold-in)
+    grown = RecommenderNet(len(scorer.user_embedding), len(scorer.book_embedding), embedding_size=model.embedding_size)
+    grown(np.zeros((1, 2), dtype=np.int32))
+    grown.user_embedding.set_weights([scorer.user_embedding])
+    grown.user_bias.set_weights([scorer.user_bias[:, None]])
+    grown.book_embedding.set_weights([scorer.book_embedding])
+    grown.book_bias.set_weights([scorer.book_bias[:, None]])
+    grown.compile(
+        loss=model.loss,
+        optimizer=model.optimizer.__class__.from_config(model.optimizer.get_config()),
+        metrics=[tf.keras.metrics.RootMeanSquaredError()]
+    )
+    return grown
+#%% md
+# #### Membangun Class IncrementalUpdater
+# 
+# Pada tahap ini, kami membuat class `IncrementalUpdater` agar user dan rating baru dapat langsung dipakai untuk rekomendasi tanpa mengulang seluruh pipeline dari `pd.read_csv` sampai `model.fit`.
+# 
+# **Proses `add_ratings`:**
+# 1. User-ID dan ISBN baru ditambahkan di akhir encoder milik updater (`user_encoder`/`isbn_encoder` yang diberikan lewat constructor) dengan `IDEncoder.add`, sehingga kode yang sudah ada tidak berubah.
+# 2. Hanya baris `user_item_matrix` milik user yang berubah yang disusun ulang (rating lama pada pasangan user-buku yang sama ditimpa, rating 0 menghapus entri), lalu disisipkan dengan `replace_csr_rows`. Baris lain disalin per blok tanpa penjumlahan sparse maupun sorting ulang.
+# 3. Tabel embedding dan bias pada scorer diperbesar dengan baris nol, dan `book_metadata` ditambah baris untuk buku baru.
+# 4. **Fold-in**: vektor setiap user yang berubah diselesaikan dengan ridge regression terhadap embedding buku yang dibekukan. Target berupa logit rating ternormalisasi dikurangi bias buku, sehingga `sigmoid(u · b + bias_user + bias_buku)` mendekati rating user.
+# 5. `UserNeighborIndex.update_rows` menormalisasi ulang baris user yang berubah saja, menambal baris tersebut pada matriks ternormalisasi dan transposenya, lalu membuang cache tetangga hanya untuk user yang terpengaruh (user yang berubah dan co-rater buku yang tersentuh). Pada mode `'full'` (`dense_similarity`), matriks similarity diperbesar untuk user baru, lalu hanya baris dan kolom milik user yang berubah yang dihitung ulang dengan `cosine_similarity`.
+# 6. Jika `result_cache` dipasang, hasil User-Based untuk user yang diperbarui beserta co-rater-nya, dan hasil neural untuk user yang di-fold-in, dihapus dari cache.
+# 
+# **Alasan:**
+# - Retraining penuh membutuhkan waktu berjam-jam, sedangkan fold-in satu user hanya berupa satu sistem linear berukuran `(embedding_size + 1)`.
+# - `grow_recommender_net` (opsional) membangun `RecommenderNet` baru dengan ukuran tabel terbaru dan bobot dari scorer, sehingga model Keras dapat di-fine-tune atau disimpan setelah update.
+# 
+# Buku baru belum memiliki embedding sampai model dilatih ulang (barisnya bernilai nol). Agar tidak masuk Top-N dengan skor `sigmoid(bias_user)`, `RecommenderNetScorer.recommend` me-mask buku dengan index >= `num_trained_books`, sehingga buku tersebut belum muncul di rekomendasi model-based; indeks ANN (`BookEmbeddingIndex`) juga perlu dibangun ulang untuk mencakup buku baru.
+# 
+# User yang ditambahkan tanpa rating bukan nol (misalnya hanya rating 0) tidak dapat di-fold-in, sehingga vektornya diisi nol dengan bias rata-rata user.
+#%%
+updater = IncrementalUpdater(
+    scorer,
+    user_item_matrix,
+    rating_scaler,
+    user_encoder,
+    isbn_encoder,
+    neighbor_index=user_similarity if isinstance(user_similarity, UserNeighborIndex) else None,
+    dense_similarity=None if isinstance(user_similarity, UserNeighborIndex) else user_similarity,
+    book_metadata=book_metadata,
+    book_catalog=books_filtered
+)
+
+# Contoh: user baru yang merating 5 buku populer dengan nilai tinggi
+popular_books = np.argsort(-np.diff(user_item_matrix.tocsc().indptr))[:5]
+new_user_id = user_encoder.classes_.max() + 1
+new_user_isbns = isbn_encoder.decode(popular_books)
+
+start = time.perf_counter()
+new_user_encoded = updater.add_ratings([new_user_id] * 5, new_user_isbns, [9, 10, 8, 9, 10])[0]
+print(f"Fold-in user baru: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+start = time.perf_counter()
+updater.fold_in_user(new_user_encoded)
+print(f"Fold-in ulang satu user (tanpa update matriks): {(time.perf_counter() - start) * 1000:.3f} ms")
+
+# Sanity check: rating yang ditimpa, buku baru, dan user yang hanya memberi rating 0 harus menghasilkan
+# matriks dan indeks tetangga yang sama dengan membangun ulang dari awal
+existing_user = user_encoder.classes_[0]
+zero_user_id = new_user_id + 1
+for user in range(min(50, len(user_encoder))):
+    if isinstance(user_similarity, UserNeighborIndex):
+        user_similarity.neighbors(user, 5)
+expected_matrix = updater.user_item_matrix.tolil(copy=True)
+updater.add_ratings([existing_user, existing_user, zero_user_id], [new_user_isbns[0], 'FOLD-IN-TEST-ISBN', new_user_isbns[1]], [7, 8, 0])
+expected_matrix.resize(updater.user_item_matrix.shape)
+expected_matrix[user_encoder.encode([existing_user])[0], isbn_encoder.encode([new_user_isbns[0], 'FOLD-IN-TEST-ISBN'])] = [7, 8]
+assert (updater.user_item_matrix != expected_matrix.tocsr()).nnz == 0
+if updater.neighbor_index is not None:
+    reference = UserNeighborIndex(updater.user_item_matrix)
+    assert abs(updater.neighbor_index.user_item_normalized - reference.user_item_normalized).max() < 1e-6
+    assert abs(updater.neighbor_index.user_item_normalized_t - reference.user_item_normalized_t).max() < 1e-6
+    assert all(key[0] != user_encoder.encode([existing_user])[0] for key in updater.neighbor_index.cache)
+if updater.dense_similarity is not None:
+    assert np.allclose(updater.dense_similarity, cosine_similarity(updater.user_item_matrix), atol=1e-6)
+assert np.isfinite(scorer.user_embedding[user_encoder.encode([zero_user_id])[0]]).all()
+# Buku baru (embedding nol) tidak masuk Top-N model-based sampai model dilatih ulang
+check_books, _ = scorer.recommend(np.arange(min(100, len(user_encoder))), top_n=10, exclude_matrix=updater.user_item_matrix)
+assert (check_books < scorer.num_trained_books).all()
+
+# Perbarui variabel global agar cell berikutnya memakai state terbaru
+user_item_matrix = updater.user_item_matrix
+book_metadata = updater.book_metadata
+if updater.dense_similarity is not None:
+    user_similarity = updater.dense_similarity
+num_users, num_books = user_item_matrix.shape
+model = grow_recommender_net(model, scorer)
+candidate_generator.update(user_item_matrix)
+
+new_user_books, new_user_scores = scorer.recommend(new_user_encoded, top_n=5, exclude_matrix=user_item_matrix)
+print('Rekomendasi model-based:', isbn_encoder.decode(new_user_books[0]).tolist())
+recommend_books_userbased(new_user_id, user_item_matrix, user_similarity, book_metadata, top_n=5, n_neighbors=20)
+#%% md
+# #### Contoh Fold-In User Baru
+# 
+# **Proses:**
+# - Menambahkan satu user baru yang merating 5 buku terpopuler, lalu mengukur waktu `add_ratings` (termasuk update matriks dan indeks tetangga) serta waktu fold-in satu user saja.
+# - Memperbarui variabel global (`user_item_matrix`, `book_metadata`, `num_users`, `num_books`, dan `model`) agar cell berikutnya memakai state terbaru.
+# - Menampilkan rekomendasi model-based (`scorer.recommend`) dan user-based (`recommend_books_userbased`) untuk user baru tersebut.
+# 
+# **Hasil:**
+# - User baru langsung mendapatkan rekomendasi dari kedua pendekatan tanpa retraining.
+# - Fold-in satu user hanya membutuhkan waktu dalam orde milidetik.
+#%%
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import make_pipeline
+
+class ContentIndex:
+    # Indeks Content-Based (TF-IDF + Top-K tetangga) yang bisa ditambah buku baru tanpa rebuild penuh
+    def __init__(self, books, vectorizer, tfidf_matrix, neighbors, title_to_indices, isbn_to_index, block_size=512,
+                 result_cache=None):
+        self.books = books
+        self.vectorizer = vectorizer
+        self.tfidf_matrix = tfidf_matrix.tocsr()
+        self.neighbors = neighbors
+        self.title_to_indices = title_to_indices
+        self.isbn_to_index = isbn_to_index
+        self.block_size = block_size
+        self.result_cache = result_cache
+
+        # Setiap baris menyimpan tepat K tetangga, sehingga indices/data dapat dilihat sebagai array (N, K)
+        self.top_k = int(neighbors.indptr[1] - neighbors.indptr[0])
+        assert np.array_equal(np.diff(neighbors.indptr), np.full(neighbors.shape[0], self.top_k))
+
+    @classmethod
+    def build(cls, books, mode='frozen', top_k=50, block_size=512):
+        # mode='frozen'  : TfidfVectorizer, vocabulary dan idf dibekukan setelah fit (kata baru diabaikan)
+        # mode='hashing' : HashingVectorizer + TfidfTransformer, kata baru tetap punya fitur tanpa refit
+        if mode == 'frozen':
+            vectorizer = TfidfVectorizer(stop_words='english')
+        elif mode == 'hashing':
+            vectorizer = make_pipeline(
+                HashingVectorizer(stop_words='english', alternate_sign=False, norm=None),
+                TfidfTransformer()
+            )
+        else:
+            raise ValueError(f"Mode vectorizer tidak dikenal: {mode}")
+
+        books = books.reset_index(drop=True)
+        tfidf_matrix = vectorizer.fit_transform(books['Book-Title'].fillna(''))
+        neighbors = build_topk_similarity(tfidf_matrix, top_k=top_k, block_size=block_size)
+        title_to_indices = books.groupby('Book-Title', sort=False).indices
+        isbn_to_index = {x: i for i, x in enumerate(books['ISBN'])}
+        return cls(books, vectorizer, tfidf_matrix, neighbors, title_to_indices, isbn_to_index, block_size)
+
+    def add_books(self, new_books):
+        # Buku yang ISBN-nya sudah ada di indeks dilewati
+        new_books = new_books[~new_books['ISBN'].isin(self.isbn_to_index)].drop_duplicates('ISBN')
+        new_books = new_books.assign(**{'Book-Title': new_books['Book-Title'].fillna('')}).reset_index(drop=True)
+        if new_books.empty:
+            return 0
+
+        n_old, n_new, top_k = self.tfidf_matrix.shape[0], len(new_books), self.top_k
+        n_total = n_old + n_new
+
+        # 1. Vektor TF-IDF buku baru dengan vectorizer yang sama (tanpa fit ulang)
+        new_matrix = self.vectorizer.transform(new_books['Book-Title']).tocsr()
+        self.tfidf_matrix = vstack([self.tfidf_matrix, new_matrix]).tocsr()
+        new_sims = (new_matrix @ self.tfidf_matrix.T.tocsc()).tocsr()
+
+        # 2. Top-K tetangga untuk buku baru terhadap seluruh katalog (lama + baru)
+        new_indices = np.empty((n_new, top_k), dtype=np.int32)
+        new_scores = np.empty((n_new, top_k), dtype=np.float32)
+        for start in range(0, n_new, self.block_size):
+            end = min(start + self.block_size, n_new)
+            rows = np.arange(end - start)
+            block = new_sims[start:end].toarray().astype(np.float32)
+            block[rows, n_old + start + rows] = -np.inf  # Buang dirinya sendiri
+            new_indices[start:end], new_scores[start:end] = select_topk(block, top_k)
+
+        # 3. Sisipkan buku baru ke daftar tetangga buku lama jika skornya melebihi tetangga ke-K
+        neighbor_indices = self.neighbors.indices.reshape(n_old, top_k).astype(np.int32)
+        neighbor_scores = self.neighbors.data.reshape(n_old, top_k).astype(np.float32)
+        sims_t = new_sims[:, :n_old].T.tocsr()
+        sims_rows = np.repeat(np.arange(n_old), np.diff(sims_t.indptr))
+        qualifies = sims_t.data > neighbor_scores[sims_rows, -1]
+        affected = np.unique(sims_rows[qualifies])
+
+        new_columns = n_old + np.arange(n_new, dtype=np.int32)
+        for start in range(0, len(affected), self.block_size):
+            rows = affected[start:start + self.block_size]
+            merged_scores = np.hstack([neighbor_scores[rows], sims_t[rows].toarray().astype(np.float32)])
+            merged_indices = np.hstack([neighbor_indices[rows], np.broadcast_to(new_columns, (len(rows), n_new))])
+            positions, neighbor_scores[rows] = select_topk(merged_scores, top_k)
+            neighbor_indices[rows] = np.take_along_axis(merged_indices, positions, axis=1)
+
+        indptr = np.arange(0, n_total * top_k + 1, top_k, dtype=np.int64)
+        self.neighbors = csr_matrix(
+            (np.concatenate([neighbor_scores.ravel(), new_scores.ravel()]),
+             np.concatenate([neighbor_indices.ravel(), new_indices.ravel()]),
+             indptr),
+            shape=(n_total, n_total)
+        )
+
+        # 4. Perbarui katalog dan index judul/ISBN
+        self.books = pd.concat([self.books, new_books], ignore_index=True)
+        for i, (isbn, title) in enumerate(zip(new_books['ISBN'], new_books['Book-Title']), start=n_old):
+            self.isbn_to_index[isbn] = i
+            existing = self.title_to_indices.get(title)
+            self.title_to_indices[title] = np.array([i]) if existing is None else np.append(existing, i)
+
+        # 5. Hasil Content-Based di cache untuk buku yang daftar tetangganya berubah tidak berlaku lagi
+        if self.result_cache is not None:
+            self.result_cache.invalidate([('content', book) for book in affected.tolist()])
+
+        self.last_update = {'new_books': n_new, 'updated_neighbor_lists': len(affected)}
+        return n_new
+#%% md
+# #### Indeks Content-Based Inkremental untuk Buku Baru
+# 
+# Pada tahap ini, kami membuat class `ContentIndex` yang membungkus `tfidf`, `tfidf_matrix`, `content_neighbors`, `title_to_indices`, dan `isbn_to_index`, sehingga buku baru dapat ditambahkan tanpa membangun ulang seluruh indeks.
+# 
+# **Pilihan vectorizer (`ContentIndex.build`):**
+# - `mode='frozen'`: `TfidfVectorizer` dengan vocabulary dan idf yang dibekukan setelah fit. Kata yang belum pernah muncul pada judul lama diabaikan.
+# - `mode='hashing'`: `HashingVectorizer` + `TfidfTransformer`, sehingga kata baru tetap mendapatkan fitur (hash) tanpa perlu fit ulang.
+# 
+# **Proses `add_books`:**
+# 1. Judul buku baru diubah menjadi vektor TF-IDF dengan vectorizer yang sama, lalu ditambahkan ke `tfidf_matrix`.
+# 2. Top-K tetangga buku baru dihitung terhadap seluruh katalog (per blok, seperti `build_topk_similarity`).
+# 3. Untuk buku lama, buku baru hanya disisipkan jika similarity-nya melebihi skor tetangga ke-K saat ini. Karena setiap baris menyimpan tepat K tetangga, `indices` dan `data` pada CSR dapat diolah sebagai array `(N, K)`, dan hanya baris yang terpengaruh yang digabung ulang dengan `select_topk`.
+# 4. `books`, `title_to_indices`, dan `isbn_to_index` diperbarui.
+# 5. Jika `result_cache` dipasang, hasil Content-Based untuk buku lama yang daftar tetangganya berubah dihapus dari cache.
+# 
+# **Alasan:**
+# - Buku baru masuk setiap hari, sedangkan rebuild penuh menghitung similarity seluruh pasangan buku. Dengan `add_books`, biayanya hanya sebanding dengan jumlah buku baru dikali ukuran katalog.
+#%%
+# Gunakan TF-IDF dan indeks Top-K yang sudah dibangun di atas (mode frozen)
+content_index = ContentIndex(books_filtered, tfidf, tfidf_matrix, content_neighbors, title_to_indices, isbn_to_index)
+
+# Contoh: buku baru yang belum pernah dirating (diambil dari Books.csv, di luar books_filtered)
+new_books = books[~books['ISBN'].isin(content_index.isbn_to_index)].head(100)
+
+start = time.perf_counter()
+content_index.add_books(new_books)
+print(f"Menambahkan {content_index.last_update['new_books']} buku: {(time.perf_counter() - start) * 1000:.1f} ms")
+print(f"Daftar tetangga buku lama yang diperbarui: {content_index.last_update['updated_neighbor_lists']}")
+
+# Perbarui variabel global yang dipakai fungsi rekomendasi Content-Based
+books_filtered = content_index.books
+tfidf_matrix = content_index.tfidf_matrix
+content_neighbors = content_index.neighbors
+
+recommend_books('Harry Potter and the Chamber of Secrets (Book 2)')
+#%% md
+# #### Contoh Penambahan Buku Baru ke Indeks Content-Based
+# 
+# **Proses:**
+# - Membungkus indeks yang sudah ada ke dalam `ContentIndex` (mode frozen), sehingga tidak ada perhitungan ulang.
+# - Menambahkan 100 buku dari `Books.csv` yang belum ada di `books_filtered`, lalu mengukur waktunya dan jumlah daftar tetangga buku lama yang ikut diperbarui.
+# - Memperbarui `books_filtered`, `tfidf_matrix`, dan `content_neighbors` sehingga `recommend_books` langsung dapat merekomendasikan buku baru.
+#%% md
 # ## Analisis Modeling
 #%% md
 # Pada bagian ini, kami membangun dua pendekatan sistem rekomendasi untuk menyelesaikan permasalahan prediksi buku yang relevan untuk pengguna.
@@ -1547,14 +3446,14 @@ print(recommended_books)
 # 
 # #### Proses:
 # - Membuat TF-IDF vectorizer dari kolom `Book-Title`.
-# - Menghitung cosine similarity antar judul buku.
+# - Menghitung cosine similarity antar judul buku secara per blok dan menyimpan Top-50 tetangga untuk setiap buku.
 # - Membuat fungsi `recommend_books(book_title)` untuk menghasilkan Top-N rekomendasi.
 # 
 # #### Output:
 # - TF-IDF Matrix Shape: **(24.253, 16.052)**
-# - Cosine Similarity Matrix Shape: **(24.253, 24.253)**
+# - Content Neighbor Index Shape: **(24.253, 24.253)** dengan 50 tetangga per buku
 # 
-# > Matriks cosine similarity berhasil dibuat untuk mengukur kemiripan antar buku berdasarkan judul.
+# > Indeks Top-K cosine similarity berhasil dibuat untuk mengukur kemiripan antar buku berdasarkan judul tanpa menyimpan matriks dense N x N.
 # 
 # #### Contoh Hasil Rekomendasi Top-5 Buku (Menggunakan Content-Based Filtering)
 # 
@@ -1583,7 +3482,7 @@ print(recommended_books)
 # 
 # #### Proses:
 # - Membentuk User-Item Matrix dari data rating.
-# - Menghitung cosine similarity antar user berdasarkan User-Item Matrix.
+# - Menghitung cosine similarity antar user berdasarkan User-Item Matrix (on-demand per user, dengan cache LRU).
 # - Membuat fungsi `recommend_books_userbased(user_id)` untuk menghasilkan Top-N rekomendasi berdasarkan user similarity.
 # 
 # #### Output:
@@ -1700,6 +3599,81 @@ plt.show()
 # - Model konvergen dengan baik dalam waktu sekitar 10–15 epoch.
 # 
 # Hal ini menunjukkan bahwa model cukup mampu mempelajari pola interaksi pengguna-buku dan membuat prediksi dengan error yang relatif rendah.
+#%%
+# Fungsi untuk menghitung Precision@K
+def precision_at_k(recommended_books, relevant_books, k=5):
+    """
+    Menghitung precision pada Top-K rekomendasi.
+    recommended_books: list ISBN yang direkomendasikan
+    relevant_books: list ISBN yang relevan (diberi rating tinggi oleh user)
+    """
+    if not relevant_books:
+        return 0.0
+    recommended_top_k = recommended_books[:k]
+    hits = len(set(recommended_top_k) & set(relevant_books))  # Buku relevan yang muncul di Top-K
+    return hits / k
+
+# Ambil user aktif yang sudah memberikan minimal 5 rating
+active_users = ratings_clean['user_id'].value_counts()
+sample_users = active_users[active_users >= 5].sample(100, random_state=42).index  # Sampling 100 user
+
+precision_scores = []
+
+# Iterasi untuk setiap user yang diambil
+for user_id in sample_users:
+    # Ambil semua rating tinggi (≥7) dari user
+    user_rated_books = ratings_clean[(ratings_clean['user_id'] == user_id) & (ratings_clean['book_rating'] >= 7)]
+    relevant_isbns = user_rated_books['isbn'].tolist()  # ISBN yang relevan untuk user
+
+    if not relevant_isbns:
+        continue  # Skip user jika tidak ada buku dengan rating tinggi
+
+    # Pilih salah satu buku sebagai input untuk rekomendasi
+    input_book_isbn = relevant_isbns[0]
+    input_title = books_filtered[books_filtered['ISBN'] == input_book_isbn]['Book-Title'].values
+    if len(input_title) == 0:
+        continue  # Skip jika judul tidak ditemukan
+
+    # Cari index dari judul di TF-IDF matrix
+    idx = books_filtered[books_filtered['Book-Title'] == input_title[0]].index
+    if len(idx) == 0:
+        continue  # Skip jika tidak ada index-nya
+
+    # Ambil Top-5 buku termirip dari indeks Top-K content_neighbors (sudah terurut, tanpa buku input sendiri)
+    top_indices = recommend_books_by_index(idx[0], top_n=5).index
+
+    # Ambil ISBN dari buku rekomendasi
+    recommended_isbns = books_filtered.loc[top_indices, 'ISBN'].tolist()
+
+    # Hitung precision untuk user ini
+    prec = precision_at_k(recommended_isbns, relevant_isbns)
+    precision_scores.append(prec)
+
+# Hitung rata-rata Precision@5 dari seluruh user
+avg_precision_at_5 = sum(precision_scores) / len(precision_scores)
+print(f"Average Precision@5 for CBF: {avg_precision_at_5:.4f}")
+#%% md
+# ### Insight Evaluasi Content-Based Filtering (Precision@5)
+# 
+# Berdasarkan hasil evaluasi menggunakan metrik **Precision@5**, sistem rekomendasi berbasis Content-Based Filtering menghasilkan rata-rata:
+# 
+# 
+# #### Interpretasi Hasil:
+# - Rata-rata precision sebesar **6.33%** menunjukkan bahwa hanya sebagian kecil rekomendasi yang benar-benar relevan menurut histori rating pengguna.
+# - Sistem masih cenderung merekomendasikan buku dengan judul yang sangat mirip, namun **tidak selalu disukai user**.
+# - Pendekatan ini kurang mampu menangkap preferensi pengguna secara menyeluruh karena hanya mengandalkan fitur `Book-Title`.
+# 
+# #### Kemungkinan Penyebab:
+# - **Kemiripan judul tidak menjamin kesamaan isi atau genre**.
+# - Sistem hanya menggunakan informasi dari judul buku tanpa mempertimbangkan metadata lain seperti sinopsis, genre, atau penulis.
+# - Banyak buku dengan judul yang hampir sama (misalnya versi audio, edisi spesial) menyebabkan sistem merekomendasikan buku-buku yang sebenarnya sudah diketahui atau dimiliki user.
+# 
+# #### Nilai Tambah:
+# Meskipun nilai precision rendah, pendekatan ini tetap **bermanfaat untuk mengatasi cold-start**, khususnya:
+# - Untuk **user baru** yang belum memiliki histori rating.
+# - Untuk **buku baru** yang belum banyak diberi rating oleh user lain.
+# 
+# > Dengan menambahkan fitur seperti sinopsis atau genre ke dalam model, performa Content-Based Filtering dapat ditingkatkan secara signifikan.
 #%% md
 # ## Analisis Evaluasi
 #%% md
@@ -1795,4 +3769,935 @@ plt.show()
 # - User-Based Collaborative Filtering efektif menghubungkan user dengan user lain yang memiliki minat serupa.
 # - Model-Based Collaborative Filtering berbasis Keras mampu menangkap pola kompleks dalam interaksi user dan buku, dan menghasilkan rekomendasi yang lebih fleksibel dan personal.
 # 
-# **Semua metrik dan hasil evaluasi konsisten dengan konteks data, problem statement, dan solusi yang ditargetkan.**
\ No newline at end of file
+# **Semua metrik dan hasil evaluasi konsisten dengan konteks data, problem statement, dan solusi yang ditargetkan.**
+#%% md
+# # Deployment dan Serving
+#%%
+import pickle
+import shutil
+from pathlib import Path
+from scipy.sparse import issparse
+
+class ArtifactStore:
+    # Menyimpan artifact model ke folder; array disimpan sebagai .npy agar bisa di-memory-map saat dimuat.
+    # Setiap save ditulis ke folder versi sendiri (path/versions/<model_version>), dan path/current adalah
+    # symlink ke versi aktif yang diganti secara atomik
+    def __init__(self, path, keep_versions=3):
+        self.path = Path(path)
+        self.keep_versions = keep_versions
+
+    def save(self, artifacts, model_version=None):
+        base_version = model_version or time.strftime('%Y%m%d%H%M%S')
+        versions = self.path / 'versions'
+        versions.mkdir(parents=True, exist_ok=True)
+        # Versi yang sudah ada tidak pernah ditimpa, karena mungkin sedang di-mmap oleh worker
+        model_version, suffix = base_version, 1
+        while (versions / model_version).exists():
+            model_version, suffix = f'{base_version}-{suffix}', suffix + 1
+
+        # Tulis ke folder sementara lalu rename ke folder versi, sehingga isinya sudah lengkap sebelum dipakai
+        tmp_path = versions / f'.{model_version}.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir()
+
+        manifest, objects = {}, {}
+        for name, value in artifacts.items():
+            if issparse(value):
+                # Sparse matrix disimpan per komponen CSR (bukan .npz) supaya setiap komponen bisa di-mmap
+                value = value.tocsr()
+                for part in ('data', 'indices', 'indptr'):
+                    np.save(tmp_path / f'{name}.{part}.npy', getattr(value, part))
+                manifest[name] = {'kind': 'csr', 'shape': value.shape}
+            elif isinstance(value, np.ndarray) and value.dtype != object:
+                np.save(tmp_path / f'{name}.npy', value)
+                manifest[name] = {'kind': 'array'}
+            else:
+                objects[name] = value
+                manifest[name] = {'kind': 'object'}
+
+        metadata = {
+            'model_version': model_version,
+            'manifest': manifest,
+            'objects': objects
+        }
+        with open(tmp_path / 'metadata.pkl', 'wb') as f:
+            pickle.dump(metadata, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.rename(versions / model_version)
+
+        # Ganti symlink current secara atomik (os.replace): worker selalu melihat versi lama atau versi baru
+        tmp_link = self.path / '.current.tmp'
+        if tmp_link.is_symlink():
+            tmp_link.unlink()
+        tmp_link.symlink_to(Path('versions') / model_version)
+        os.replace(tmp_link, self.path / 'current')
+        self._prune(model_version)
+        return model_version
+
+    def _prune(self, current_version):
+        # Versi lama dihapus, tetapi beberapa versi terakhir disimpan untuk worker yang masih memakainya
+        versions = sorted(
+            (p for p in (self.path / 'versions').iterdir() if not p.name.startswith('.')),
+            key=lambda p: p.stat().st_mtime
+        )
+        for old in versions[:-self.keep_versions]:
+            if old.name != current_version:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def load(self, mmap=True, model_version=None):
+        # Symlink current di-resolve sekali, sehingga seluruh file dibaca dari versi yang sama
+        version_path = (self.path / 'versions' / model_version) if model_version else (self.path / 'current').resolve()
+
+        # mmap_mode='r': halaman file dibagi (shared) antar proses serving dan hanya dibaca saat dibutuhkan
+        with open(version_path / 'metadata.pkl', 'rb') as f:
+            metadata = pickle.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        artifacts = {'model_version': metadata['model_version']}
+        for name, entry in metadata['manifest'].items():
+            if entry['kind'] == 'csr':
+                data, indices, indptr = (
+                    np.load(version_path / f'{name}.{part}.npy', mmap_mode=mmap_mode)
+                    for part in ('data', 'indices', 'indptr')
+                )
+                artifacts[name] = csr_matrix((data, indices, indptr), shape=entry['shape'], copy=False)
+            elif entry['kind'] == 'array':
+                artifacts[name] = np.load(version_path / f'{name}.npy', mmap_mode=mmap_mode)
+            else:
+                artifacts[name] = metadata['objects'][name]
+        return artifacts
+#%% md
+# #### Membangun Artifact Store
+# 
+# Pada tahap ini, kami membuat class `ArtifactStore` untuk menyimpan seluruh hasil pipeline sehingga proses serving tidak perlu menjalankan ulang pipeline dari `pd.read_csv` sampai `model.fit`.
+# 
+# **Format penyimpanan:**
+# - **Sparse matrix** (`tfidf_matrix`, `content_neighbors`, `user_item_matrix`, dan matriks ternormalisasi milik `UserNeighborIndex`): disimpan per komponen CSR (`data`, `indices`, `indptr`) sebagai file `.npy`. Format `.npz` tidak dipakai karena isinya terkompresi dalam zip sehingga tidak dapat di-memory-map.
+# - **Array dense** (embedding, bias, daftar ID untuk encoder, dan rentang rating `rating_scaler`): file `.npy`.
+# - **Objek lain** (vectorizer TF-IDF, metadata buku, index judul/ISBN): disimpan bersama manifest dan `model_version` dalam `metadata.pkl` menggunakan pickle.
+# 
+# **Proses loading:**
+# - Semua file `.npy` dibuka dengan `np.load(..., mmap_mode='r')`, sehingga data tidak disalin ke memori proses. Halaman file dibagi oleh semua proses serving melalui page cache sistem operasi dan hanya dibaca ketika diakses.
+# - Setiap `save` ditulis ke folder versinya sendiri (`versions/<model_version>`, melalui folder sementara lalu di-*rename*), kemudian symlink `current` diarahkan ke versi baru dengan `os.replace` yang atomik. Proses yang memuat artifact selalu melihat versi lama atau versi baru yang lengkap, dan `load` me-*resolve* `current` sekali sehingga semua file dibaca dari versi yang sama.
+# - Versi lama tidak langsung dihapus: `keep_versions` versi terakhir tetap disimpan untuk worker yang masih memakainya.
+#%%
+def save_serving_artifacts(path='artifacts'):
+    # Kumpulkan state pipeline yang dibutuhkan untuk serving
+    artifacts = {
+        'tfidf_matrix': tfidf_matrix,
+        'content_neighbors': content_neighbors,
+        'user_item_matrix': user_item_matrix,
+        'user_embedding': scorer.user_embedding,
+        'user_bias': scorer.user_bias,
+        'book_embedding': scorer.book_embedding,
+        'book_bias': scorer.book_bias,
+        'num_trained_books': np.array(scorer.num_trained_books),
+        'user_ids': user_encoder.classes_,
+        'user_ids_order': user_encoder.order_,
+        'isbn_ids': isbn_encoder.classes_,
+        'isbn_ids_order': isbn_encoder.order_,
+        'tfidf': tfidf,
+        'rating_range': np.array([rating_scaler.min_rating, rating_scaler.max_rating], dtype=np.float64),
+        'books_filtered': books_filtered,
+        'book_metadata': book_metadata,
+        'title_to_indices': title_to_indices,
+        'isbn_to_index': isbn_to_index
+    }
+    if isinstance(user_similarity, UserNeighborIndex):
+        artifacts['user_item_normalized'] = user_similarity.user_item_normalized
+        artifacts['user_item_normalized_t'] = user_similarity.user_item_normalized_t
+    return ArtifactStore(path).save(artifacts)
+
+def load_serving_artifacts(path='artifacts', mmap=True, model_version=None):
+    # Bangun ulang objek serving langsung dari artifact, tanpa training maupun perhitungan similarity
+    artifacts = ArtifactStore(path).load(mmap=mmap, model_version=model_version)
+    artifacts['scorer'] = RecommenderNetScorer(
+        artifacts['user_embedding'], artifacts['user_bias'],
+        artifacts['book_embedding'], artifacts['book_bias'], int(artifacts['num_trained_books'])
+    )
+    artifacts['rating_scaler'] = RatingScaler(*artifacts['rating_range'].tolist())
+    if 'user_item_normalized' in artifacts:
+        artifacts['user_similarity'] = UserNeighborIndex.from_normalized(
+            artifacts['user_item_normalized'], artifacts['user_item_normalized_t']
+        )
+    else:
+        # Artifact dari mode similarity 'full' tidak menyimpan matriks ternormalisasi; cosine on-demand memberi skor yang sama
+        artifacts['user_similarity'] = UserNeighborIndex(artifacts['user_item_matrix'])
+    artifacts['user_encoder'] = IDEncoder(artifacts['user_ids'], order=artifacts['user_ids_order'])
+    artifacts['isbn_encoder'] = IDEncoder(artifacts['isbn_ids'], order=artifacts['isbn_ids_order'])
+    return artifacts
+
+model_version = save_serving_artifacts('artifacts')
+print('Model version:', model_version)
+
+# Simulasi cold start worker serving: muat artifact dengan memory-map
+start = time.perf_counter()
+serving = load_serving_artifacts('artifacts')
+print(f"Cold start (load artifact): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+# Hasil rekomendasi dari artifact harus sama dengan state di memori
+serving_books, _ = serving['scorer'].recommend(example_users, top_n=5, exclude_matrix=serving['user_item_matrix'])
+memory_books, _ = scorer.recommend(example_users, top_n=5, exclude_matrix=user_item_matrix)
+assert np.array_equal(serving_books, memory_books)
+assert isinstance(serving['book_embedding'], np.memmap)
+
+# Save berikutnya menulis versi baru; worker yang masih memakai versi lama tetap dapat membaca artifact-nya
+next_version = save_serving_artifacts('artifacts')
+assert next_version != model_version and ArtifactStore('artifacts').load()['model_version'] == next_version
+assert np.array_equal(serving['scorer'].recommend(example_users, top_n=5, exclude_matrix=serving['user_item_matrix'])[0], serving_books)
+print('Rekomendasi dari artifact sama dengan state di memori')
+#%% md
+# #### Menyimpan dan Memuat Artifact untuk Serving
+# 
+# **Proses:**
+# - `save_serving_artifacts` menyimpan TF-IDF, indeks Top-K content, User-Item Matrix, matriks ternormalisasi untuk similarity user, embedding dan bias model, daftar ID encoder, serta objek pendukung lainnya.
+# - `load_serving_artifacts` memuat artifact dengan memory-map, lalu membangun `RecommenderNetScorer`, `UserNeighborIndex`, dan `IDEncoder` langsung dari array tersebut (tanpa membangun dictionary). Jika artifact berasal dari mode similarity `'full'` (tanpa matriks ternormalisasi), `UserNeighborIndex` dibangun dari `user_item_matrix`, sehingga serving tetap memakai cosine similarity on-demand.
+# - Kami memastikan bahwa rekomendasi dari artifact sama dengan rekomendasi dari state di memori, dan bahwa save berikutnya (versi baru) tidak mengganggu artifact versi lama yang masih dipakai.
+# 
+# **Hasil:**
+# - Worker serving tidak perlu membaca CSV, membangun TF-IDF, menghitung similarity, maupun melatih ulang `RecommenderNet`. Cold start cukup berupa membuka file artifact (di bawah satu detik).
+#%%
+import os
+from functools import partial
+
+from joblib.externals.loky import get_reusable_executor
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+def _rank_columns(n_rows, top_n):
+    # Kolom rank 1..top_n untuk hasil Top-N berukuran (n_rows, top_n)
+    return np.tile(np.arange(1, top_n + 1, dtype=np.int16), n_rows)
+
+class _BatchWorker:
+    # Penampung state per proses worker. Atribut `artifacts` sengaja hanya diisi di worker oleh _init_batch_worker:
+    # class ini ikut dikirim (cloudpickle) bersama setiap task, dan atribut yang tidak ada di proses utama tidak ditimpa
+    pass
+
+def _init_batch_worker(artifact_path, model_version):
+    # Initializer worker: setiap worker memuat artifact (memory-map) sendiri, bukan mewarisi state proses utama
+    _BatchWorker.artifacts = load_serving_artifacts(artifact_path, model_version=model_version)
+
+def _neural_batch(block, top_n):
+    # Top-N RecommenderNet untuk satu blok user dalam satu perkalian matriks
+    art = _BatchWorker.artifacts
+    start, stop = block
+    users = np.arange(start, stop)
+    top_books, top_scores = art['scorer'].recommend(users, top_n=top_n, exclude_matrix=art['user_item_matrix'])
+    return pa.table({
+        'user_id': art['user_encoder'].decode(np.repeat(users, top_books.shape[1])),
+        'rank': _rank_columns(len(users), top_books.shape[1]),
+        'isbn': art['isbn_encoder'].decode(top_books.ravel()),
+        'predicted_rating': art['rating_scaler'].inverse_transform(top_scores.ravel()).astype(np.float32)
+    })
+
+def _userbased_batch(block, top_n, **kwargs):
+    # User-based CF untuk satu blok user; setiap user memakai userbased_scores yang sama dengan fungsi rekomendasinya
+    art = _BatchWorker.artifacts
+    start, stop = block
+    has_metadata = art['book_metadata']['Book-Title'].notna().to_numpy()
+    users, ranks, books, scores = [], [], [], []
+    for idx in range(start, stop):
+        candidate_books, candidate_scores = userbased_scores(idx, art['user_item_matrix'], art['user_similarity'], **kwargs)
+        top_books = top_n_indices(candidate_scores, top_n)
+        # Sama seperti recommend_books_userbased: buku tanpa metadata dibuang setelah Top-N dipilih
+        top_books = top_books[has_metadata[candidate_books[top_books]]]
+        users.append(np.full(len(top_books), idx))
+        ranks.append(np.arange(1, len(top_books) + 1, dtype=np.int16))
+        books.append(candidate_books[top_books])
+        scores.append(candidate_scores[top_books])
+    return pa.table({
+        'user_id': art['user_encoder'].decode(np.concatenate(users)),
+        'rank': np.concatenate(ranks),
+        'isbn': art['isbn_encoder'].decode(np.concatenate(books)),
+        'average_rating': np.concatenate(scores).astype(np.float32)
+    })
+
+def _content_batch(block, top_n):
+    # Top-N Content-Based untuk satu blok buku, langsung dari baris content_neighbors yang sudah terurut
+    art = _BatchWorker.artifacts
+    content_neighbors = art['content_neighbors']
+    start, stop = block
+    indptr = content_neighbors.indptr
+    counts = np.minimum(np.diff(indptr[start:stop + 1]), top_n)
+    rows = np.repeat(np.arange(start, stop), counts)
+    rank = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    positions = indptr[rows] + rank
+    isbns = art['books_filtered']['ISBN'].to_numpy()
+    return pa.table({
+        'isbn': isbns[rows],
+        'rank': (rank + 1).astype(np.int16),
+        'recommended_isbn': isbns[content_neighbors.indices[positions]],
+        'similarity': content_neighbors.data[positions].astype(np.float32)
+    })
+
+BATCH_JOBS = {
+    # nama job: (fungsi per blok, jumlah baris yang diproses dari artifact)
+    'neural': (_neural_batch, lambda art: art['user_item_matrix'].shape[0]),
+    'userbased': (_userbased_batch, lambda art: art['user_item_matrix'].shape[0]),
+    'content': (_content_batch, lambda art: art['content_neighbors'].shape[0])
+}
+
+def run_batch_job(job, output_path, artifact_path='artifacts', top_n=10, block_size=512, n_workers=None, **kwargs):
+    # Precompute Top-N untuk semua user/buku per blok di process pool, lalu tulis ke Parquet
+    block_fn, n_rows = BATCH_JOBS[job]
+    # Versi artifact ditentukan sekali, sehingga semua worker membaca versi yang sama walaupun `current` berganti
+    artifacts = ArtifactStore(artifact_path).load()
+    model_version, n_rows = artifacts['model_version'], n_rows(artifacts)
+    blocks = [(start, min(start + block_size, n_rows)) for start in range(0, n_rows, block_size)]
+    n_workers = n_workers or os.cpu_count()
+
+    # Worker loky adalah proses Python baru (bukan fork dari proses yang sudah menjalankan TensorFlow),
+    # dan masing-masing memuat artifact dengan memory-map melalui initializer
+    start = time.perf_counter()
+    n_written = 0
+    writer = None
+    executor = get_reusable_executor(
+        max_workers=n_workers, initializer=_init_batch_worker, initargs=(artifact_path, model_version), reuse=False
+    )
+    try:
+        # Hasil ditulis per blok (satu row group per blok), sehingga memori proses utama tetap kecil
+        for table in executor.map(partial(block_fn, top_n=top_n, **kwargs), blocks):
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema, compression='zstd')
+            writer.write_table(table)
+            n_written += table.num_rows
+    finally:
+        executor.shutdown(wait=True)
+        if writer is not None:
+            writer.close()
+
+    return {
+        'job': job,
+        'model_version': model_version,
+        'rows': n_rows,
+        'recommendations': n_written,
+        'blocks': len(blocks),
+        'workers': n_workers,
+        'seconds': time.perf_counter() - start,
+        'file_mb': os.path.getsize(output_path) / 2**20 if writer is not None else 0.0
+    }
+
+os.makedirs('batch', exist_ok=True)
+batch_stats = pd.DataFrame([
+    run_batch_job('neural', 'batch/neural_top10.parquet'),
+    run_batch_job('userbased', 'batch/userbased_top10.parquet', n_neighbors=5),
+    run_batch_job('content', 'batch/content_top10.parquet')
+])
+print(batch_stats)
+
+# Sanity check: hasil batch sama dengan fungsi rekomendasi satu query
+neural_batch = pd.read_parquet('batch/neural_top10.parquet')
+check_user = user_encoder.classes_[0]
+expected_books, _ = scorer.recommend(0, top_n=10, exclude_matrix=user_item_matrix)
+assert neural_batch.loc[neural_batch['user_id'] == check_user, 'isbn'].tolist() == isbn_encoder.decode(expected_books[0]).tolist()
+
+userbased_batch = pd.read_parquet('batch/userbased_top10.parquet')
+expected = recommend_books_userbased(check_user, user_item_matrix, user_similarity, book_metadata, top_n=10)
+assert userbased_batch.loc[userbased_batch['user_id'] == check_user, 'isbn'].tolist() == expected['ISBN'].tolist()
+
+content_batch = pd.read_parquet('batch/content_top10.parquet')
+check_isbn = books_filtered['ISBN'].iloc[0]
+expected = recommend_books_by_isbn(check_isbn, top_n=10)
+assert content_batch.loc[content_batch['isbn'] == check_isbn, 'recommended_isbn'].tolist() == books_filtered['ISBN'].loc[expected.index].tolist()
+print('Hasil batch sama dengan fungsi rekomendasi satu query')
+#%% md
+# #### Batch Rekomendasi untuk Semua User dan Buku
+# 
+# Pada tahap ini, kami membuat batch job untuk menghitung Top-N rekomendasi bagi seluruh user (RecommenderNet dan User-Based CF) dan seluruh buku (Content-Based), misalnya untuk job harian.
+# 
+# **Teknik yang digunakan:**
+# - User atau buku dibagi ke dalam blok berukuran `block_size`, lalu setiap blok diproses oleh executor `loky` (bawaan `joblib`, seperti pada `ParallelSGDTrainer`). Worker adalah proses Python baru, bukan `fork` dari proses notebook yang sudah menjalankan thread TensorFlow.
+# - Setiap worker memuat artifact dari `ArtifactStore` melalui initializer (`load_serving_artifacts` dengan memory-map), sehingga model, User-Item Matrix, indeks similarity, dan encoder dibaca dari file yang sama dan halaman memorinya dibagi lewat page cache. Versi artifact ditentukan sekali di awal job, sehingga semua worker membaca versi yang sama.
+# - **RecommenderNet**: satu blok user diproses dengan satu perkalian matriks melalui `scorer.recommend`.
+# - **User-Based CF**: setiap user dihitung dengan `userbased_scores`, fungsi yang sama dengan yang dipakai `recommend_books_userbased`.
+# - **Content-Based**: Top-N diambil langsung dari baris `content_neighbors` yang sudah terurut, secara vektorisasi untuk satu blok buku sekaligus.
+# - Hasil ditulis ke file **Parquet** (kolumnar, kompresi zstd) per blok sebagai row group, sehingga memori proses utama tidak bertambah seiring jumlah user.
+# 
+# **Proses:**
+# - `run_batch_job(job, output_path, artifact_path, top_n, block_size, n_workers)` menjalankan salah satu job (`'neural'`, `'userbased'`, `'content'`) dan mengembalikan statistik waktu serta ukuran file.
+# - Setiap baris Parquet berisi ID (User-ID atau ISBN), `rank`, ISBN rekomendasi, dan skornya.
+# - Kami memastikan hasil batch sama dengan fungsi rekomendasi satu query untuk contoh user dan buku.
+# 
+# **Alasan:**
+# - Memanggil fungsi rekomendasi satu per satu untuk setiap user mengulang overhead per query (membuat DataFrame, lookup metadata) dan hanya memakai satu core CPU.
+# - Dengan blok dan process pool, pekerjaan terbagi ke semua core, dan file Parquet dapat langsung dibaca oleh layanan lain.
+#%%
+import asyncio
+import json
+import threading
+from contextlib import suppress
+from urllib.parse import parse_qs, urlsplit
+
+class MicroBatcher:
+    # Menggabungkan permintaan neural yang datang bersamaan menjadi satu perkalian matriks embedding
+    def __init__(self, scorer, exclude_matrix, max_batch_size=64, max_wait_ms=2.0):
+        self.scorer = scorer
+        self.exclude_matrix = exclude_matrix
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.batch_sizes = []
+
+    async def submit(self, user_index, top_n):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((user_index, top_n, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        while True:
+            # Tunggu permintaan pertama, lalu kumpulkan permintaan lain selama max_wait
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            users = np.array([user for user, _, _ in batch])
+            top_n = max(n for _, n, _ in batch)
+            try:
+                # Perkalian matriks dijalankan di thread lain agar event loop tetap menerima koneksi
+                books, scores = await loop.run_in_executor(
+                    None, partial(self.scorer.recommend, users, top_n=top_n, exclude_matrix=self.exclude_matrix)
+                )
+            except Exception:
+                # Satu permintaan yang gagal tidak boleh menggagalkan permintaan lain di batch yang sama,
+                # jadi batch dihitung ulang per permintaan dan error hanya dikirim ke permintaan tersebut
+                await self._run_each(batch)
+                continue
+            self.batch_sizes.append(len(batch))
+            for i, (_, n, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result((books[i, :n], scores[i, :n]))
+
+    async def _run_each(self, batch):
+        loop = asyncio.get_running_loop()
+        for user, n, future in batch:
+            try:
+                books, scores = await loop.run_in_executor(
+                    None, partial(self.scorer.recommend, np.array([user]), top_n=n, exclude_matrix=self.exclude_matrix)
+                )
+            except Exception as error:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                if not future.done():
+                    future.set_result((books[0], scores[0]))
+
+class RecommendationService:
+    # HTTP service sederhana berbasis asyncio di atas artifact yang sudah dimuat
+    max_top_n = 100
+
+    def __init__(self, artifacts, host='127.0.0.1', port=0, max_batch_size=64, max_wait_ms=2.0, result_cache=None):
+        self.artifacts = artifacts
+        self.host = host
+        self.port = port
+        self.result_cache = result_cache
+        self.batcher = MicroBatcher(artifacts['scorer'], artifacts['user_item_matrix'], max_batch_size, max_wait_ms)
+        self.routes = {
+            '/health': self.health,
+            '/recommend/content': self.recommend_content,
+            '/recommend/user': self.recommend_user,
+            '/recommend/neural': self.recommend_neural
+        }
+        self.loop = None
+        self.server = None
+        self._ready = threading.Event()
+
+    async def _cached(self, recommender, query, top_n, tag, compute):
+        # Respons yang sukses disimpan di result_cache (jika ada) dengan key yang memuat versi model artifact
+        if self.result_cache is None:
+            return await compute()
+        key = (recommender, query, top_n, self.artifacts['model_version'])
+        body = self.result_cache.get(*key)
+        if body is None:
+            status, body = await compute()
+            if status != 200:
+                return status, body
+            self.result_cache.put(*key, body, tags=[(recommender, tag)])
+        return 200, body
+
+    def _int_param(self, params, name, default, maximum=None):
+        # Parameter integer harus >= 1; nilai yang terlalu besar dipotong ke maximum
+        try:
+            value = int(params.get(name, default))
+        except ValueError:
+            raise ValueError(f'{name} harus berupa bilangan bulat') from None
+        if value < 1:
+            raise ValueError(f'{name} harus >= 1')
+        return value if maximum is None else min(value, maximum)
+
+    # ---------- Endpoint ----------
+    async def health(self, params):
+        body = {'status': 'ok'}
+        if self.result_cache is not None:
+            body['cache'] = self.result_cache.stats()
+        return 200, body
+
+    async def recommend_content(self, params):
+        art = self.artifacts
+        top_n = self._int_param(params, 'top_n', 5, self.max_top_n)
+        if 'isbn' in params:
+            idx = art['isbn_to_index'].get(params['isbn'])
+        else:
+            rows = art['title_to_indices'].get(params.get('title'))
+            idx = rows[0] if rows is not None else None
+        if idx is None:
+            return 404, {'error': 'buku tidak ditemukan'}
+
+        async def compute():
+            neighbors = art['content_neighbors']
+            start, end = neighbors.indptr[idx], min(neighbors.indptr[idx + 1], neighbors.indptr[idx] + top_n)
+            rows = self._metadata_rows(art['books_filtered'], neighbors.indices[start:end])
+            return 200, {'items': [
+                {'isbn': isbn, 'title': title, 'author': author, 'score': float(score)}
+                for isbn, title, author, score in zip(rows['ISBN'], rows['Book-Title'], rows['Book-Author'], neighbors.data[start:end])
+            ]}
+        return await self._cached('content', int(idx), top_n, int(idx), compute)
+
+    def _user_index(self, params):
+        try:
+            user_id = int(params['user_id'])
+        except (KeyError, ValueError):
+            return -1
+        return self.artifacts['user_encoder'].encode([user_id])[0]
+
+    @staticmethod
+    def _metadata_rows(frame, positions):
+        # NaN (misalnya Book-Author kosong) diganti None, karena json.dumps menulis token NaN yang bukan JSON standar
+        rows = frame.iloc[positions][['ISBN', 'Book-Title', 'Book-Author']]
+        return rows.astype(object).where(rows.notna(), None)
+
+    def _book_items(self, books, scores, score_name):
+        # Susun hasil dari index encoded buku; buku tanpa metadata dibuang seperti pada fungsi rekomendasi
+        rows = self._metadata_rows(self.artifacts['book_metadata'], books)
+        return [
+            {'isbn': isbn, 'title': title, 'author': author, score_name: float(score)}
+            for isbn, title, author, score in zip(rows['ISBN'], rows['Book-Title'], rows['Book-Author'], scores)
+            if isinstance(title, str)
+        ]
+
+    async def recommend_user(self, params):
+        idx = self._user_index(params)
+        if idx < 0:
+            return 404, {'error': 'user tidak ditemukan'}
+        top_n = self._int_param(params, 'top_n', 5, self.max_top_n)
+        n_neighbors = self._int_param(params, 'n_neighbors', 5, self.max_top_n)
+        art = self.artifacts
+
+        async def compute():
+            candidate_books, scores = await asyncio.get_running_loop().run_in_executor(
+                None, partial(userbased_scores, idx, art['user_item_matrix'], art['user_similarity'], n_neighbors)
+            )
+            top_books = top_n_indices(scores, top_n)
+            return 200, {'items': self._book_items(candidate_books[top_books], scores[top_books], 'average_rating')}
+        return await self._cached('userbased', (int(idx), n_neighbors), top_n, int(idx), compute)
+
+    async def recommend_neural(self, params):
+        idx = self._user_index(params)
+        if idx < 0:
+            return 404, {'error': 'user tidak ditemukan'}
+        top_n = self._int_param(params, 'top_n', 5, self.max_top_n)
+
+        async def compute():
+            books, scores = await self.batcher.submit(idx, top_n)
+            ratings = self.artifacts['rating_scaler'].inverse_transform(scores)
+            return 200, {'items': self._book_items(books, ratings, 'predicted_rating')}
+        return await self._cached('neural', int(idx), top_n, int(idx), compute)
+
+    # ---------- HTTP ----------
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # Header tidak dipakai, cukup dibaca sampai baris kosong
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                status, body = 405, {'error': 'hanya GET yang didukung'}
+            else:
+                url = urlsplit(request_line[1])
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                route = self.routes.get(url.path)
+                if route is None:
+                    status, body = 404, {'error': f'endpoint {url.path} tidak ada'}
+                else:
+                    try:
+                        status, body = await route(params)
+                    except ValueError as error:
+                        status, body = 400, {'error': str(error)}
+                    except Exception as error:
+                        # Error tak terduga tetap dijawab (500), bukan memutus koneksi tanpa respons
+                        status, body = 500, {'error': f'internal error: {type(error).__name__}'}
+            payload = json.dumps(body).encode()
+            writer.write(
+                f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\nConnection: close\r\n\r\n'.encode()
+                + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _serve(self):
+        batcher_task = asyncio.create_task(self.batcher.run())
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, backlog=1024)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            # Batcher dihentikan dan ditunggu sampai benar-benar selesai sebelum event loop ditutup
+            batcher_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await batcher_task
+
+    def start(self):
+        # Service dijalankan di thread background dengan event loop sendiri
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(self._serve())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self.loop.close()
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        # Menutup server membuat serve_forever selesai, lalu batcher ikut dihentikan
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.thread.join()
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return json.loads(response.read())
+
+def get_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+service = RecommendationService(serving).start()
+print('Service berjalan di', service.url)
+
+# Uji setiap endpoint terhadap fungsi rekomendasi di notebook
+check_user = serving['user_encoder'].classes_[0]
+content_isbn = serving['books_filtered']['ISBN'].iloc[0]
+content_items = get_json(f'{service.url}/recommend/content?isbn={content_isbn}&top_n=5')['items']
+assert [item['isbn'] for item in content_items] == recommend_books_by_isbn(content_isbn).index.map(books_filtered['ISBN']).tolist()
+
+user_items = get_json(f'{service.url}/recommend/user?user_id={check_user}&top_n=5')['items']
+expected = recommend_books_userbased(check_user, user_item_matrix, user_similarity, book_metadata, top_n=5)
+assert [item['isbn'] for item in user_items] == expected['ISBN'].tolist()
+
+# Beban paralel pada endpoint neural: permintaan yang datang bersamaan digabung oleh micro-batcher
+load_users = serving['user_encoder'].classes_[:min(200, len(serving['user_encoder']))]
+start = time.perf_counter()
+with ThreadPoolExecutor(max_workers=32) as pool:
+    responses = list(pool.map(lambda user: get_json(f'{service.url}/recommend/neural?user_id={user}&top_n=5'), load_users))
+elapsed = time.perf_counter() - start
+
+expected_books, _ = serving['scorer'].recommend(np.arange(len(load_users)), top_n=5, exclude_matrix=serving['user_item_matrix'])
+has_metadata = serving['book_metadata']['Book-Title'].notna().to_numpy()
+for response, books_encoded in zip(responses, expected_books):
+    assert [item['isbn'] for item in response['items']] == serving['isbn_encoder'].decode(books_encoded[has_metadata[books_encoded]]).tolist()
+
+print(f"{len(load_users)} permintaan neural: {len(load_users) / elapsed:,.0f} req/detik")
+print(f"Jumlah batch: {len(service.batcher.batch_sizes)}, rata-rata ukuran batch: {np.mean(service.batcher.batch_sizes):.1f}")
+
+# Validasi parameter: top_n < 1 atau bukan angka ditolak (400), top_n yang terlalu besar dipotong
+assert get_status(f'{service.url}/recommend/neural?user_id={check_user}&top_n=0') == 400
+assert get_status(f'{service.url}/recommend/user?user_id={check_user}&top_n=abc') == 400
+capped_items = get_json(f'{service.url}/recommend/content?isbn={content_isbn}&top_n=1000000')['items']
+assert len(capped_items) <= RecommendationService.max_top_n
+
+# Permintaan yang gagal di dalam satu batch tidak menggagalkan permintaan lain di batch yang sama
+batch_futures = [
+    asyncio.run_coroutine_threadsafe(service.batcher.submit(user, 5), service.loop)
+    for user in (0, len(serving['user_encoder']) + 10**6, 1)
+]
+assert np.array_equal(batch_futures[0].result(timeout=30)[0], expected_books[0])
+assert np.array_equal(batch_futures[2].result(timeout=30)[0], expected_books[1])
+assert isinstance(batch_futures[1].exception(timeout=30), IndexError)
+
+# Error tak terduga pada handler dijawab dengan 500
+async def failing_route(params):
+    raise RuntimeError('gagal')
+service.routes['/fail'] = failing_route
+assert get_status(f'{service.url}/fail') == 500
+
+# Penulis kosong (NaN) dikirim sebagai null, bukan token NaN yang ditolak oleh parser JSON yang ketat
+def reject_constant(name):
+    raise ValueError(f'JSON tidak standar: {name}')
+
+original_books = serving['books_filtered']
+serving['books_filtered'] = original_books.assign(**{'Book-Author': np.nan})
+with urllib.request.urlopen(f'{service.url}/recommend/content?isbn={content_isbn}&top_n=5', timeout=30) as response:
+    strict_items = json.loads(response.read(), parse_constant=reject_constant)['items']
+serving['books_filtered'] = original_books
+assert strict_items and all(item['author'] is None for item in strict_items)
+service.stop()
+assert not service.thread.is_alive() and service.loop.is_closed()
+#%% md
+# #### HTTP Service dengan Micro-Batching
+# 
+# Pada tahap ini, kami membuat HTTP service sederhana berbasis `asyncio` yang melayani ketiga model rekomendasi dari artifact yang sudah dimuat (`serving`).
+# 
+# **Endpoint:**
+# - `GET /recommend/content?isbn=...` atau `?title=...`: Content-Based Filtering dari indeks Top-K `content_neighbors`.
+# - `GET /recommend/user?user_id=...&n_neighbors=...`: User-Based CF melalui `userbased_scores`.
+# - `GET /recommend/neural?user_id=...`: RecommenderNet melalui micro-batcher.
+# - `GET /health`: cek status service. Semua endpoint menerima `top_n` dan mengembalikan JSON.
+# 
+# **Teknik yang digunakan:**
+# - Server dibangun dengan `asyncio.start_server` (tanpa library tambahan) dan dijalankan di thread background dengan event loop sendiri, sehingga dapat diuji dari notebook melalui `localhost`.
+# - **Micro-batching**: permintaan neural dimasukkan ke `asyncio.Queue`. `MicroBatcher` mengambil permintaan pertama, lalu menunggu paling lama `max_wait_ms` (atau sampai `max_batch_size`) untuk permintaan lain, kemudian menghitung semuanya dengan satu `scorer.recommend` (satu perkalian matriks embedding).
+# - Perhitungan yang berat (perkalian matriks dan skor User-Based) dijalankan dengan `run_in_executor`, sehingga event loop tetap dapat menerima koneksi baru selama perhitungan berjalan.
+# - Jika perhitungan satu batch gagal, batch tersebut dihitung ulang per permintaan, sehingga error hanya diterima oleh permintaan yang menyebabkannya.
+# - `top_n` dan `n_neighbors` harus bilangan bulat >= 1 (jika tidak, 400) dan dipotong ke `max_top_n` (100), sehingga satu permintaan tidak dapat memperbesar `top_n` seluruh batch. Error tak terduga pada handler dijawab dengan 500.
+# - `stop()` menutup server, lalu task batcher di-*cancel* dan ditunggu sampai selesai sebelum event loop ditutup.
+# - Metadata buku yang kosong (NaN, misalnya `Book-Author`) diubah menjadi `None` sebelum serialisasi, sehingga respons selalu berupa JSON standar (`null`, bukan `NaN`).
+# 
+# **Proses:**
+# - Hasil setiap endpoint dibandingkan dengan fungsi rekomendasi di notebook.
+# - Endpoint neural diuji dengan 200 permintaan paralel dari 32 thread, lalu dicatat throughput dan rata-rata ukuran batch.
+# - Kami juga menguji validasi `top_n`, batch yang berisi satu permintaan gagal, respons 500, dan proses `stop()`.
+# 
+# **Alasan:**
+# - Biaya satu perkalian matriks untuk banyak user hampir sama dengan biaya untuk satu user, karena yang dominan adalah membaca matriks embedding buku. Menggabungkan permintaan yang datang bersamaan meningkatkan throughput saat beban tinggi, dengan tambahan latensi maksimal `max_wait_ms`.
+#%%
+from collections import defaultdict
+
+class ResultCache:
+    # Cache hasil rekomendasi dengan LRU + TTL, key = (recommender, query, top_n, model_version)
+    def __init__(self, max_size=10_000, ttl=600.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()      # key -> (waktu kedaluwarsa, hasil, tag)
+        self.tag_keys = defaultdict(set)  # tag -> key yang bergantung padanya, untuk invalidasi
+        self.lock = threading.RLock()     # dipakai bersama oleh notebook dan thread service
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, recommender, query, top_n, model_version, default=None):
+        key = (recommender, query, top_n, model_version)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(entry[1])
+
+    def put(self, recommender, query, top_n, model_version, value, tags=()):
+        # Tag (recommender, id) menandai user/buku yang menjadi dasar hasil ini; tag (recommender,) untuk semua hasil recommender
+        key = (recommender, query, top_n, model_version)
+        tags = tuple(tags) + ((recommender,),)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (self.clock() + self.ttl, value, tags)
+            for tag in tags:
+                self.tag_keys[tag].add(key)
+            while len(self.entries) > self.max_size:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, recommender, query, top_n, model_version, compute, tags=()):
+        missing = object()
+        value = self.get(recommender, query, top_n, model_version, default=missing)
+        if value is missing:
+            value = compute()
+            self.put(recommender, query, top_n, model_version, value, tags)
+            value = self._copy(value)
+        return value
+
+    @staticmethod
+    def _copy(value):
+        # Caller selalu menerima salinan (DataFrame, list, dict), sehingga mengubah hasil tidak merusak isi cache
+        return value.copy() if hasattr(value, 'copy') else value
+
+    def _remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tag_keys[tag]
+            keys.discard(key)
+            if not keys:
+                del self.tag_keys[tag]
+
+    def invalidate(self, tags):
+        # Hapus semua hasil yang memiliki salah satu tag, misalnya [('userbased', 12), ('neural',)]
+        removed = 0
+        with self.lock:
+            for tag in tags:
+                for key in list(self.tag_keys.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.invalidations += removed
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tag_keys.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+# Cache dipasang pada updater dan indeks Content-Based, sehingga invalidasi berjalan otomatis
+result_cache = ResultCache(max_size=10_000, ttl=600)
+updater.result_cache = result_cache
+content_index.result_cache = result_cache
+
+def cached_recommend_books(title, top_n=5):
+    book_rows = title_to_indices.get(title)
+    if book_rows is None:
+        return recommend_books(title, top_n)
+    book = int(book_rows[0])
+    return result_cache.get_or_compute('content', title, top_n, model_version,
+                                       lambda: recommend_books_by_index(book, top_n), tags=[('content', book)])
+
+def cached_recommend_userbased(user_id, top_n=5, n_neighbors=5):
+    user = int(user_encoder.encode([user_id])[0])
+    if user < 0:
+        return recommend_books_userbased(user_id, user_item_matrix, user_similarity, book_metadata, top_n)
+    return result_cache.get_or_compute(
+        'userbased', (user_id, n_neighbors), top_n, model_version,
+        lambda: recommend_books_userbased(user_id, user_item_matrix, user_similarity, book_metadata, top_n, n_neighbors),
+        tags=[('userbased', user)]
+    )
+
+def cached_recommend_neural(user_id, top_n=5):
+    user = int(user_encoder.encode([user_id])[0])
+    if user < 0:
+        # Index -1 akan mengambil embedding user terakhir, jadi user yang tidak dikenal tidak boleh di-score atau di-cache
+        return f"User ID {user_id} tidak ditemukan dalam data."
+    return result_cache.get_or_compute(
+        'neural', user_id, top_n, model_version,
+        lambda: isbn_encoder.decode(scorer.recommend(user, top_n, exclude_matrix=user_item_matrix)[0][0]).tolist(),
+        tags=[('neural', user)]
+    )
+
+# Simulasi trafik yang sangat miring (Zipf): sebagian kecil judul populer mendapat sebagian besar permintaan
+rng = np.random.default_rng(42)
+titles = books_filtered['Book-Title'].dropna().unique()
+popularity = 1 / np.arange(1, len(titles) + 1) ** 1.1
+queries = titles[rng.choice(len(titles), size=5_000, p=popularity / popularity.sum())]
+
+start = time.perf_counter()
+for title in queries:
+    recommend_books(title)
+uncached_time = time.perf_counter() - start
+
+start = time.perf_counter()
+for title in queries:
+    cached_recommend_books(title)
+cached_time = time.perf_counter() - start
+print(f"Tanpa cache: {uncached_time:.2f} s, dengan cache: {cached_time:.2f} s")
+print(result_cache.stats())
+
+# Invalidasi Content-Based: buku baru dengan judul yang sama masuk ke daftar tetangga buku yang di-cache
+query_title = queries[0]
+query_book = int(title_to_indices[query_title][0])
+cached_recommend_books(query_title)
+new_book = pd.DataFrame({'ISBN': ['CACHE-TEST-1'], 'Book-Title': [query_title + ' (Special Edition)'], 'Book-Author': ['Unknown']})
+content_index.add_books(new_book)
+books_filtered, tfidf_matrix, content_neighbors = content_index.books, content_index.tfidf_matrix, content_index.neighbors
+assert result_cache.get('content', query_title, 5, model_version) is None
+assert content_index.isbn_to_index['CACHE-TEST-1'] in cached_recommend_books(query_title, top_n=50).index
+
+# Hasil dari cache adalah salinan: mengubahnya tidak mengubah hasil cache berikutnya
+cached_result = cached_recommend_books(query_title)
+cached_result['Book-Title'] = 'diubah oleh caller'
+assert not (cached_recommend_books(query_title)['Book-Title'] == 'diubah oleh caller').any()
+
+# Invalidasi rating: user memberi rating baru, hasil User-Based dan neural user tersebut dihitung ulang
+rating_user = user_encoder.classes_[0]
+cached_recommend_userbased(rating_user)
+cached_recommend_neural(rating_user)
+updater.add_ratings([rating_user], [isbn_encoder.classes_[1]], [10])
+user_item_matrix, book_metadata = updater.user_item_matrix, updater.book_metadata
+candidate_generator.update(user_item_matrix)
+assert result_cache.get('userbased', (rating_user, 5), 5, model_version) is None
+assert result_cache.get('neural', rating_user, 5, model_version) is None
+assert cached_recommend_neural(rating_user) == isbn_encoder.decode(scorer.recommend(0, 5, exclude_matrix=user_item_matrix)[0][0]).tolist()
+
+# User yang tidak dikenal tidak di-score dengan embedding user lain dan tidak masuk cache
+cache_size = len(result_cache.entries)
+assert isinstance(cached_recommend_neural(-12345), str) and isinstance(cached_recommend_userbased(-12345), str)
+assert len(result_cache.entries) == cache_size
+
+# TTL dan LRU dengan clock buatan
+fake_now = [0.0]
+small_cache = ResultCache(max_size=2, ttl=10, clock=lambda: fake_now[0])
+small_cache.put('content', 'a', 5, 'v1', 'A')
+small_cache.put('content', 'b', 5, 'v1', 'B')
+small_cache.get('content', 'a', 5, 'v1')
+small_cache.put('content', 'c', 5, 'v1', 'C')  # 'b' paling lama tidak dipakai -> dibuang
+assert small_cache.get('content', 'b', 5, 'v1') is None and small_cache.get('content', 'a', 5, 'v1') == 'A'
+assert small_cache.get('content', 'a', 5, 'v2') is None  # versi model berbeda = key berbeda
+fake_now[0] = 11
+assert small_cache.get('content', 'c', 5, 'v1') is None and small_cache.stats()['expirations'] == 1
+
+# Cache juga dapat dipasang pada HTTP service
+service = RecommendationService(serving, result_cache=ResultCache(max_size=10_000, ttl=60)).start()
+for _ in range(3):
+    get_json(f"{service.url}/recommend/neural?user_id={serving['user_encoder'].classes_[0]}&top_n=5")
+print('Cache service:', get_json(f'{service.url}/health')['cache'])
+service.stop()
+#%% md
+# #### Result Cache dengan LRU dan TTL
+# 
+# Pada tahap ini, kami membuat class `ResultCache` untuk menyimpan hasil rekomendasi yang sering diminta, karena trafik rekomendasi sangat miring (judul populer diminta berulang kali).
+# 
+# **Teknik yang digunakan:**
+# - Key cache berupa `(recommender, query, top_n, model_version)`, sehingga hasil dari versi model yang berbeda tidak pernah tertukar.
+# - **LRU**: entri disimpan dalam `OrderedDict` (seperti cache tetangga pada `UserNeighborIndex`); entri yang paling lama tidak dipakai dibuang saat ukuran melebihi `max_size`.
+# - **TTL**: setiap entri memiliki waktu kedaluwarsa `ttl` detik, sehingga hasil lama tetap diperbarui walaupun tidak ada invalidasi.
+# - Counter `hits`, `misses`, `evictions`, `expirations`, dan `invalidations` tersedia melalui `stats()`.
+# - `get` dan `get_or_compute` mengembalikan salinan hasil (`.copy()` untuk DataFrame, list, dan dict), sehingga caller yang mengubah hasil tidak merusak entri cache.
+# 
+# **Invalidasi otomatis:**
+# - Setiap hasil diberi tag `(recommender, id)` sesuai user atau buku yang menjadi dasar hasil tersebut.
+# - `ContentIndex.add_books` menghapus hasil Content-Based untuk buku yang daftar tetangganya berubah.
+# - `IncrementalUpdater.add_ratings` menghapus hasil User-Based untuk user yang diperbarui dan semua co-rater-nya (similarity mereka berubah), serta hasil neural untuk user yang di-fold-in. Buku baru tidak membuat hasil neural user lain dihapus, karena buku yang embedding-nya belum dilatih di-mask pada `scorer.recommend` (`num_trained_books`) sampai model dilatih ulang.
+# - Model yang dilatih ulang mendapatkan `model_version` baru, sehingga entri lama tidak terpakai lagi dan akan terbuang oleh LRU/TTL.
+# 
+# **Proses:**
+# - `cached_recommend_books`, `cached_recommend_userbased`, dan `cached_recommend_neural` membungkus fungsi rekomendasi yang sudah ada dengan `get_or_compute`. User atau judul yang tidak dikenal langsung mendapat pesan "tidak ditemukan" dan tidak disimpan di cache.
+# - Kami mensimulasikan 5.000 permintaan judul dengan distribusi Zipf, lalu membandingkan waktu tanpa dan dengan cache serta hit rate-nya.
+# - Kami memastikan invalidasi berjalan setelah penambahan buku dan rating baru, serta menguji LRU, TTL, dan `model_version` dengan clock buatan.
+# - `RecommendationService` menerima parameter `result_cache`, sehingga respons HTTP yang sama juga dapat dilayani dari cache.